@@ -1,13 +1,16 @@
 from flask_cors import CORS
+import json
 import os
-from modules.data_processing import detect_keyframes
-from modules.models import load_whisper_model, transcribe_audio
-from modules.presentation import generate_presentation
-from modules.summarization import get_keyframe_descriptions, summarize_with_groq
+from modules.jobs import JobQueueFull, get_job, iter_job_events, submit_job, wait_for_job
+from modules.metrics import render_prometheus
+from modules.models import preload_whisper_models, start_idle_eviction
+from modules.presentation import PRESENTATION_DIR
+from modules.uploads import (
+    KEEP_UPLOADS, UnknownUpload, UploadError, UploadOffsetMismatch, append_chunk, finalize_upload, hash_stream_to,
+    init_upload, unique_upload_path, upload_status,
+)
 from dotenv import load_dotenv
-from flask import Flask, jsonify, send_file, request
-import uuid
-import time
+from flask import Flask, Response, jsonify, send_file, request, stream_with_context
 
 app = Flask(__name__)
 # CORS(app, resources={r"/upload": {"origins": "*"}})
@@ -15,6 +18,7 @@ CORS(app)
 
 load_dotenv()
 api_key = os.getenv("GROQ_API_KEY")
+whisper_model_size = os.getenv("WHISPER_MODEL_SIZE", "base")
 
 # VIDEO_PATH = "sample/example2.mp4"
 
@@ -26,63 +30,156 @@ def home():
 def favicon():
     return "", 204
 
+def queue_video(video_path, video_hash):
+    # Queue the video for processing
+    print("Video path------>", video_path)
+    use_cache = request.args.get("nocache") not in ("1", "true")
+    try:
+        job_id = submit_job(video_path, api_key, delete_video=not KEEP_UPLOADS, whisper_model_size=whisper_model_size,
+                            video_hash=video_hash, use_cache=use_cache)
+    except JobQueueFull:
+        # A rejected upload is never processed, so it is not kept either
+        if not KEEP_UPLOADS:
+            os.remove(video_path)
+        raise
+
+    # Clients that cannot poll can still block until the job finishes
+    if request.args.get("wait") in ("1", "true"):
+        job = wait_for_job(job_id)
+        if job["status"] == "failed":
+            return jsonify({"error": job["error"], "job_id": job_id}), 500
+        return jsonify(dict(job["result"], job_id=job_id))
+
+    return jsonify({
+        "job_id": job_id,
+        "status_url": f"/jobs/{job_id}",
+        "result_url": f"/jobs/{job_id}/result",
+        "events_url": f"/jobs/{job_id}/events"
+    }), 202
+
 @app.route("/upload", methods=["POST"])
 def upload_video():
     try:
         if "video" not in request.files:
             return jsonify({"error": "No video file provided"}), 400
         
+        # Save under a unique name, hashing the bytes as they are written
         video_file = request.files["video"]
-        video_path = os.path.join("sample", video_file.filename)
-        os.makedirs("sample", exist_ok=True)  # Save videos in "sample" directory
-        video_file.save(video_path)
-        
-        # Brief delay to ensure file is fully written (optional)
-        time.sleep(1)
-        
-        if not os.path.exists(video_path):
-            return jsonify({"error": "Video file not saved properly"}), 500
-        
-        # Process the video
-        print("Video path------>", video_path)
-        keyframes = detect_keyframes(video_path)
-        keyframes_description = get_keyframe_descriptions(keyframes, api_key=api_key)
-        final_prompt = "Keyframe Descriptions:\n"
-        for i, desc in enumerate(keyframes_description.values(), 1):
-            final_prompt += f"Keyframe {i}: {desc}\n"
+        video_path = unique_upload_path(video_file.filename)
+        video_hash = hash_stream_to(video_file.stream, video_path)
         
-        whisper_model = load_whisper_model("base")
-        audio_transcript = transcribe_audio(video_path, whisper_model)
-        final_prompt += f"\nAudio Transcript:\n{audio_transcript}"
-        
-        final_summary = summarize_with_groq(final_prompt, api_key=api_key)
-        
-        # Generate and save the PowerPoint presentation
-        # ppt_filename = f"{uuid.uuid4()}.pptx"
-
-        # ppt_dir = os.path.join("static", "presentations")
-        # os.makedirs(ppt_dir, exist_ok=True)
-        # ppt_path = os.path.join(ppt_dir, ppt_filename)
-        ppt_filename= generate_presentation(final_summary)
-        
-        ppt_url = f"/{ppt_filename}"
-        
-        return jsonify({
-            "summary": final_summary,
-            "ppt_url": ppt_url
-        })
+        return queue_video(video_path, video_hash)
     
+    except JobQueueFull as e:
+        return jsonify({"error": f"Server busy: {e}"}), 503
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/uploads", methods=["POST"])
+def start_upload():
+    body = request.get_json(silent=True) or {}
+    size = body.get("size")
+    if size is not None and (not isinstance(size, int) or size < 0):
+        return jsonify({"error": "size must be a non-negative integer"}), 400
+    filename = body.get("filename", "")
+    if not isinstance(filename, str):
+        return jsonify({"error": "filename must be a string"}), 400
+    upload_id = init_upload(filename, size)
+    return jsonify({"upload_id": upload_id, "offset": 0, "upload_url": f"/uploads/{upload_id}"}), 201
+
+@app.route("/uploads/<upload_id>", methods=["GET"])
+def get_upload(upload_id):
+    try:
+        return jsonify(upload_status(upload_id))
+    except UnknownUpload as e:
+        return jsonify({"error": str(e)}), 404
+
+@app.route("/uploads/<upload_id>", methods=["PATCH", "PUT"])
+def append_upload(upload_id):
+    # Chunks are raw request bodies; Upload-Offset says where the chunk starts
+    try:
+        offset = int(request.headers.get("Upload-Offset", request.args.get("offset", "")))
+    except ValueError:
+        return jsonify({"error": "Upload-Offset header required"}), 400
+    try:
+        new_offset = append_chunk(upload_id, offset, request.stream)
+    except UploadOffsetMismatch as e:
+        return jsonify({"error": str(e), "offset": e.offset}), 409
+    except UnknownUpload as e:
+        return jsonify({"error": str(e)}), 404
+    except UploadError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"upload_id": upload_id, "offset": new_offset})
+
+@app.route("/uploads/<upload_id>/finalize", methods=["POST"])
+def finish_upload(upload_id):
+    body = request.get_json(silent=True) or {}
+    try:
+        video_path, video_hash = finalize_upload(upload_id, body.get("sha256"))
+        return queue_video(video_path, video_hash)
+    except UnknownUpload as e:
+        return jsonify({"error": str(e)}), 404
+    except UploadError as e:
+        return jsonify({"error": str(e)}), 400
+    except JobQueueFull as e:
+        return jsonify({"error": f"Server busy: {e}"}), 503
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+@app.route("/jobs/<job_id>/result")
+def job_result(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    if job["status"] == "failed":
+        return jsonify({"error": job["error"]}), 500
+    if job["status"] != "completed":
+        return jsonify({"status": job["status"], "progress": job["progress"]}), 202
+    return jsonify(job["result"])
+
+@app.route("/jobs/<job_id>/events")
+def job_events(job_id):
+    # Server-sent events: stage changes and summary text as it is generated, then done or error
+    if get_job(job_id) is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    def stream():
+        for event, data in iter_job_events(job_id):
+            if event == "ping":
+                yield ": ping\n\n"
+            else:
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return Response(stream_with_context(stream()), mimetype="text/event-stream", headers=headers)
+
+@app.route("/metrics")
+def metrics():
+    return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
+
 @app.route('/presentations/<filename>')
 def download_ppt(filename):
-    ppt_dir = "static/presentations"
-    ppt_path = os.path.join(ppt_dir, filename)
+    ppt_path = os.path.join(PRESENTATION_DIR, os.path.basename(filename))
     if not os.path.exists(ppt_path):  # Check if the file exists
         return jsonify({"error": "File not found"}), 404
 
     return send_file(ppt_path, as_attachment=True)
 
 if __name__ == "__main__":
-    app.run(debug=True, host="localhost", port=5000)
\ No newline at end of file
+    debug = True
+    # Load Whisper once at startup so the first upload does not pay for it; this stays out of
+    # module scope because spawned worker processes re-import this file as __mp_main__. With the
+    # debug reloader this block also runs in the file-watching parent, which never serves requests,
+    # so only the serving child (WERKZEUG_RUN_MAIN=true) loads models
+    if not debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        if os.getenv("WHISPER_PRELOAD", "1") != "0":
+            preload_whisper_models([whisper_model_size])
+        start_idle_eviction()
+    app.run(debug=debug, host="localhost", port=5000)
\ No newline at end of file
@@ -0,0 +1,229 @@
+"""
+Batch processing of many videos with a resumable manifest.
+
+Each video runs through the full pipeline in its own worker process; the
+manifest records the status and outputs of every video and is rewritten
+after each one finishes, so an interrupted batch picks up where it stopped
+and a failing video is recorded instead of stopping the others.
+
+Usage (from the repository root):
+    python batch.py lectures/ --output outputs/batch --jobs 4
+    python batch.py videos.txt --output outputs/batch --keyframe-workers 2 --caption-workers 8
+    python batch.py lectures/ --output outputs/batch --retry-failed
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from dotenv import load_dotenv
+
+from modules.cache import hash_file
+from modules.models import TRANSCRIBE_WORKERS, WHISPER_QUANTIZE
+from modules.pipeline import run_pipeline
+from modules.presentation import PRESENTATION_DIR
+from modules.summarization import CAPTION_WORKERS, SUMMARY_ERROR
+
+VIDEO_EXTENSIONS = {".mp4", ".mkv", ".mov", ".avi", ".webm", ".m4v"}
+MANIFEST_NAME = "manifest.json"
+
+
+def find_videos(inputs):
+    """
+    Expands directories (recursively) and list files into video paths.
+
+    Args:
+        inputs (list): Video files, directories, or text files with one path per line.
+
+    Returns:
+        list: Absolute video paths in a stable order, without duplicates.
+    """
+    videos = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                videos.extend(os.path.join(root, name) for name in sorted(files)
+                              if os.path.splitext(name)[1].lower() in VIDEO_EXTENSIONS)
+        elif os.path.splitext(item)[1].lower() in VIDEO_EXTENSIONS:
+            videos.append(item)
+        else:
+            with open(item) as f:
+                videos.extend(line.strip() for line in f if line.strip() and not line.startswith("#"))
+    return list(dict.fromkeys(os.path.abspath(video) for video in videos))
+
+
+def load_manifest(path):
+    """Returns the manifest entries keyed by video path, or an empty dict for a new batch."""
+    try:
+        with open(path) as f:
+            return json.load(f)["videos"]
+    except FileNotFoundError:
+        return {}
+
+
+def save_manifest(path, entries):
+    """Writes the manifest atomically so a crash never leaves it half-written."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"updated_at": time.time(), "videos": entries}, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _output_stem(video_path, video_hash):
+    # The hash prefix keeps lectures with the same file name in different folders apart
+    return f"{os.path.splitext(os.path.basename(video_path))[0]}_{video_hash[:12]}"
+
+
+def process_video(video_path, output_dir, options):
+    """
+    Runs the pipeline on one video in a worker process and saves its outputs.
+
+    Args:
+        video_path (str): Path to the video file.
+        output_dir (str): Directory the summary and presentation are written to.
+        options (dict): Keyword arguments forwarded to run_pipeline.
+
+    Returns:
+        dict: The manifest entry for the video.
+    """
+    start = time.time()
+    entry = {"status": "failed", "started_at": start}
+    try:
+        video_hash = hash_file(video_path)
+        entry["video_hash"] = video_hash
+        result = run_pipeline(video_path, os.getenv("GROQ_API_KEY"), video_hash=video_hash, **options)
+        if result["summary"] == SUMMARY_ERROR or not result["ppt_url"]:
+            raise RuntimeError("Summary or presentation generation failed")
+
+        stem = _output_stem(video_path, video_hash)
+        summary_path = os.path.join(output_dir, f"{stem}.txt")
+        with open(summary_path, "w", encoding="utf-8") as f:
+            f.write(result["summary"])
+        presentation_path = os.path.join(output_dir, f"{stem}.pptx")
+        shutil.move(os.path.join(PRESENTATION_DIR, os.path.basename(result["ppt_url"])), presentation_path)
+
+        entry.update(status="completed", summary_path=summary_path, presentation_path=presentation_path,
+                     timings=result["timings"])
+    except Exception as e:
+        traceback.print_exc()
+        entry["error"] = f"{type(e).__name__}: {e}"
+    entry["finished_at"] = time.time()
+    return entry
+
+
+def run_batch(videos, output_dir, jobs, options, retry_failed=False):
+    """
+    Processes videos across a process pool, recording progress in output_dir/manifest.json.
+
+    Videos already completed in the manifest are skipped, and so are failed
+    ones unless retry_failed is set. A worker process that dies takes down
+    the whole pool, so the videos that were in flight are rerun one at a
+    time; only the one that kills its worker again is recorded as failed.
+
+    Args:
+        videos (list): Absolute video paths.
+        output_dir (str): Directory for the manifest and outputs.
+        jobs (int): Number of videos processed at the same time.
+        options (dict): Keyword arguments forwarded to run_pipeline.
+        retry_failed (bool): Whether videos that failed in an earlier run are processed again.
+
+    Returns:
+        dict: The final manifest entries.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    entries = load_manifest(manifest_path)
+    skip = {"completed", "failed"} if not retry_failed else {"completed"}
+    pending = [video for video in videos if entries.get(video, {}).get("status") not in skip]
+    print(f"{len(videos)} videos, {len(videos) - len(pending)} already done, {len(pending)} to process")
+
+    done = 0
+    suspects = []
+    while pending or suspects:
+        # After a worker died, the videos that were in flight are rerun one at a time to find the culprit
+        isolate = bool(suspects)
+        queue = suspects if isolate else pending
+        window = 1 if isolate else 2 * jobs
+        with ProcessPoolExecutor(max_workers=1 if isolate else jobs) as executor:
+            futures = {}
+            # Keep at most 2 * jobs videos submitted so a huge backlog does not sit in the pool's queue
+            while queue or futures:
+                while queue and len(futures) < window:
+                    video = queue.pop(0)
+                    entries[video] = {"status": "running"}
+                    futures[executor.submit(process_video, video, output_dir, options)] = video
+                finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                broken = False
+                for future in finished:
+                    video = futures.pop(future)
+                    try:
+                        entries[video] = future.result()
+                    except BrokenProcessPool as e:
+                        broken = True
+                        if not isolate:
+                            suspects.append(video)
+                            continue
+                        entries[video] = {"status": "failed", "error": f"Worker process died: {e}",
+                                          "finished_at": time.time()}
+                    done += 1
+                    print(f"[{done}] {entries[video]['status']}: {video}")
+                save_manifest(manifest_path, entries)
+                if broken:
+                    # Every outstanding future fails with the pool, so those videos are suspects too
+                    suspects.extend(futures.values())
+                    break
+
+    counts = {}
+    for video in videos:
+        status = entries.get(video, {}).get("status", "missing")
+        counts[status] = counts.get(status, 0) + 1
+    print("Batch finished: " + ", ".join(f"{count} {status}" for status, count in sorted(counts.items())))
+    return entries
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize many videos into slides, resumably.")
+    parser.add_argument("inputs", nargs="+", help="video files, directories, or text files listing video paths")
+    parser.add_argument("--output", default=os.path.join("outputs", "batch"),
+                        help="directory for summaries, presentations and the manifest")
+    parser.add_argument("--jobs", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="videos processed in parallel, one worker process each")
+    parser.add_argument("--keyframe-workers", type=int, default=1,
+                        help="processes scanning segments of one video for keyframes")
+    parser.add_argument("--caption-workers", type=int, default=CAPTION_WORKERS,
+                        help="caption requests in flight per video")
+    parser.add_argument("--transcribe-workers", type=int, default=TRANSCRIBE_WORKERS,
+                        help="Whisper replicas transcribing chunks of one video")
+    parser.add_argument("--whisper-model", default=os.getenv("WHISPER_MODEL_SIZE", "base"))
+    parser.add_argument("--quantize-whisper", action="store_true", default=WHISPER_QUANTIZE,
+                        help="transcribe with the int8 dynamically quantized Whisper model (CPU)")
+    parser.add_argument("--no-cache", action="store_true", help="recompute every stage instead of using the cache")
+    parser.add_argument("--retry-failed", action="store_true", help="process videos that failed in an earlier run again")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    if not os.getenv("GROQ_API_KEY"):
+        parser.error("GROQ_API_KEY is not set")
+    videos = find_videos(args.inputs)
+    if not videos:
+        parser.error("no videos found")
+
+    options = {
+        "whisper_model_size": args.whisper_model,
+        "whisper_quantize": args.quantize_whisper,
+        "keyframe_params": {"workers": args.keyframe_workers},
+        "caption_workers": args.caption_workers,
+        "transcribe_workers": args.transcribe_workers,
+        "use_cache": not args.no_cache,
+    }
+    entries = run_batch(videos, args.output, args.jobs, options, retry_failed=args.retry_failed)
+    return 0 if all(entries[video]["status"] == "completed" for video in videos) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+"""
+Local stand-in for the Groq chat completions API, for load tests without a live key.
+
+Serves POST /openai/v1/chat/completions with canned answers shaped like the
+real ones the pipeline expects: a [Title]/[Content]/[Conclusion] summary for
+summary requests, "Keyframe <n>:" sections for batched caption requests and
+a short description otherwise. Streaming requests get server-sent event
+chunks. Latency, streaming speed and error rates are configurable, and
+injected 429s carry a Retry-After header like the real API.
+
+Point the app at it through the Groq SDK's GROQ_BASE_URL variable:
+    python -m benchmarks.fake_groq_server --port 8001 --latency 0.8 --error-rate 0.02
+    GROQ_BASE_URL=http://localhost:8001 GROQ_API_KEY=test python app.py
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+
+from flask import Flask, Response, jsonify, request
+
+app = Flask(__name__)
+
+# Injected behaviour, set from the command line
+settings = {
+    "latency": 0.5,             # mean seconds before the first byte
+    "jitter": 0.2,              # latency is drawn uniformly from latency * (1 +- jitter)
+    "tokens_per_second": 200,   # streaming speed
+    "error_rate": 0.0,          # fraction of requests answered with a 500
+    "rate_limit_rate": 0.0,     # fraction of requests answered with a 429
+    "retry_after": 1.0,
+}
+
+_stats = {"requests": 0, "errors": 0, "rate_limited": 0, "streams": 0}
+_stats_lock = threading.Lock()
+
+SUMMARY_TEMPLATE = """[Title]
+Load Test Lecture
+Generated by the local stand-in
+
+[Content]
+{sections}
+[Conclusion]
+Summary of key points
+- The stand-in server returned this text after {latency:.2f}s
+"""
+
+
+def _count(key):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def _text_of(content):
+    """Returns the text parts of a message content, which is a string or a list of parts."""
+    if isinstance(content, str):
+        return content
+    return " ".join(part.get("text", "") for part in content if part.get("type") == "text")
+
+
+def _answer(messages, max_tokens):
+    """Builds a canned answer matching the kind of request the pipeline sent."""
+    system = " ".join(_text_of(m["content"]) for m in messages if m["role"] == "system")
+    user = messages[-1]["content"]
+    prompt = _text_of(user)
+
+    if "[Title]" in system:
+        sections = "".join(f"Topic {i}\n- Point {i}.1 explains the topic briefly\n- Point {i}.2 adds more detail\n"
+                           for i in range(1, 6))
+        return SUMMARY_TEMPLATE.format(sections=sections, latency=settings["latency"])
+    batch = re.search(r"given (\d+) keyframes", prompt)
+    if batch:
+        return "\n".join(f"Keyframe {i}: A slide with a diagram and a short bullet list."
+                         for i in range(1, int(batch.group(1)) + 1))
+    if isinstance(user, list):
+        return "A slide showing a title, a diagram and several bullet points about the lecture topic."
+    words = prompt.split()
+    return "Notes\n- " + " ".join(words[:min(len(words), max_tokens // 2, 60)])
+
+
+def _chunks(text):
+    """Splits text into pieces of roughly one token each, keeping whitespace."""
+    return re.findall(r"\s*\S+", text) or [text]
+
+
+@app.route("/openai/v1/chat/completions", methods=["POST"])
+def chat_completions():
+    _count("requests")
+    body = request.get_json(force=True)
+    time.sleep(max(0.0, random.uniform(settings["latency"] * (1 - settings["jitter"]),
+                                       settings["latency"] * (1 + settings["jitter"]))))
+
+    roll = random.random()
+    if roll < settings["rate_limit_rate"]:
+        _count("rate_limited")
+        response = jsonify({"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}})
+        response.headers["retry-after"] = str(settings["retry_after"])
+        return response, 429
+    if roll < settings["rate_limit_rate"] + settings["error_rate"]:
+        _count("errors")
+        return jsonify({"error": {"message": "Injected server error", "type": "internal_server_error"}}), 500
+
+    model = body.get("model", "stand-in")
+    text = _answer(body["messages"], body.get("max_tokens") or 1024)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+
+    if not body.get("stream"):
+        return jsonify({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": len(json.dumps(body["messages"])) // 4,
+                      "completion_tokens": len(_chunks(text)), "total_tokens": 0},
+        })
+
+    _count("streams")
+
+    def stream():
+        delay = 1 / settings["tokens_per_second"] if settings["tokens_per_second"] else 0
+        for piece in _chunks(text) + [None]:
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": piece} if piece is not None else {},
+                             "finish_reason": None if piece is not None else "stop"}],
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+            if piece is not None and delay:
+                time.sleep(delay)
+        yield "data: [DONE]\n\n"
+
+    return Response(stream(), mimetype="text/event-stream")
+
+
+@app.route("/stats")
+def stats():
+    with _stats_lock:
+        return jsonify(dict(_stats, settings=settings))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=settings["latency"], help="Mean seconds to the first byte")
+    parser.add_argument("--jitter", type=float, default=settings["jitter"], help="Relative latency spread")
+    parser.add_argument("--tokens-per-second", type=float, default=settings["tokens_per_second"],
+                        help="Streaming speed; 0 streams without delays")
+    parser.add_argument("--error-rate", type=float, default=settings["error_rate"], help="Fraction of 500 answers")
+    parser.add_argument("--rate-limit-rate", type=float, default=settings["rate_limit_rate"],
+                        help="Fraction of 429 answers")
+    parser.add_argument("--retry-after", type=float, default=settings["retry_after"],
+                        help="Retry-After seconds sent with 429s")
+    args = parser.parse_args(argv)
+
+    settings.update(latency=args.latency, jitter=args.jitter, tokens_per_second=args.tokens_per_second,
+                    error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate, retry_after=args.retry_after)
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
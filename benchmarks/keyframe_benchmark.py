@@ -0,0 +1,318 @@
+"""
+Keyframe detection benchmark on deterministic synthetic videos.
+
+Generates videos with known transition points (hard cuts between slides,
+crossfades, a camera pan, a noisy static shot) using cv2.VideoWriter, runs
+detect_keyframes over a grid of parameters and reports throughput, peak
+memory and precision/recall against the known transitions as JSON lines.
+
+Usage (from the repository root):
+    python -m benchmarks.keyframe_benchmark --resolutions 640x360,1280x720 --skip-frames 1,2,4 --output results.jsonl
+    python -m benchmarks.keyframe_benchmark --baseline results.jsonl --max-slowdown 0.2
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from modules.data_processing import detect_keyframes
+
+SCENARIOS = ["slides", "fades", "motion", "static", "mixed"]
+
+
+def _make_slide(rng, width, height):
+    """Draws a slide-like frame: flat background, a title bar, text lines and a few shapes."""
+    background = rng.integers(160, 256, size=3).tolist()
+    frame = np.full((height, width, 3), background, dtype=np.uint8)
+    cv2.rectangle(frame, (0, 0), (width, height // 8), rng.integers(0, 120, size=3).tolist(), -1)
+    scale = height / 720
+    for line in range(int(rng.integers(3, 7))):
+        words = " ".join("".join(chr(c) for c in rng.integers(97, 123, size=int(rng.integers(3, 9))))
+                         for _ in range(int(rng.integers(3, 7))))
+        y = int(height / 4 + line * 70 * scale)
+        cv2.putText(frame, words, (int(40 * scale), y), cv2.FONT_HERSHEY_SIMPLEX, 1.2 * scale, (20, 20, 20),
+                    max(1, int(2 * scale)))
+    for _ in range(int(rng.integers(1, 4))):
+        x, y = int(rng.integers(width // 2, width - 60)), int(rng.integers(height // 4, height - 60))
+        w, h = int(rng.integers(30, int(150 * scale) + 31)), int(rng.integers(30, int(120 * scale) + 31))
+        cv2.rectangle(frame, (x, y), (x + w, y + h), rng.integers(0, 256, size=3).tolist(), -1)
+    return frame
+
+
+def _make_texture(rng, width, height):
+    """Smoothed noise large enough to pan across."""
+    noise = rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+    return cv2.GaussianBlur(noise, (0, 0), 3)
+
+
+def _scenario_frames(scenario, width, height, fps, duration, seed):
+    """
+    Builds the frames of a synthetic video and the frame indices where its content changes.
+
+    Returns:
+        tuple: (generator of frames, list of transition frame indices)
+    """
+    rng = np.random.default_rng(seed)
+    total = int(duration * fps)
+    slide_frames = int(6 * fps)
+    fade_frames = int(1 * fps)
+
+    if scenario == "static":
+        slide = _make_slide(rng, width, height)
+
+        def frames():
+            noise_rng = np.random.default_rng(seed + 1)
+            for _ in range(total):
+                noise = noise_rng.integers(-2, 3, size=slide.shape, dtype=np.int16)
+                yield np.clip(slide.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+        return frames(), []
+
+    if scenario in ("slides", "fades"):
+        slides = [_make_slide(rng, width, height) for _ in range(total // slide_frames + 1)]
+        # Fades are centred on the slide boundary
+        events = list(range(slide_frames, total, slide_frames))
+
+        def frames():
+            for index in range(total):
+                slide_number, offset = divmod(index, slide_frames)
+                frame = slides[slide_number]
+                if scenario == "fades" and offset >= slide_frames - fade_frames // 2 and slide_number + 1 < len(slides):
+                    alpha = (offset - (slide_frames - fade_frames // 2)) / fade_frames
+                    frame = cv2.addWeighted(frame, 1 - alpha, slides[slide_number + 1], alpha, 0)
+                elif scenario == "fades" and offset < fade_frames // 2 and slide_number > 0:
+                    alpha = (offset + fade_frames // 2) / fade_frames
+                    frame = cv2.addWeighted(slides[slide_number - 1], 1 - alpha, frame, alpha, 0)
+                yield frame
+        return frames(), events
+
+    if scenario == "motion":
+        texture = _make_texture(rng, width * 3, height)
+        pan_start, pan_end = total // 3, 2 * total // 3
+        speed = (texture.shape[1] - width) / max(1, pan_end - pan_start)
+
+        def frames():
+            for index in range(total):
+                x = int(min(max(index - pan_start, 0), pan_end - pan_start) * speed)
+                yield texture[:, x:x + width]
+        return frames(), [pan_start]
+
+    if scenario == "mixed":
+        parts = [("slides", duration / 3), ("fades", duration / 3), ("motion", duration / 3)]
+        generators, events, offset = [], [], 0
+        for part_number, (part, part_duration) in enumerate(parts):
+            part_frames, part_events = _scenario_frames(part, width, height, fps, part_duration, seed + part_number)
+            generators.append(part_frames)
+            if offset:
+                events.append(offset)
+            events.extend(offset + event for event in part_events)
+            offset += int(part_duration * fps)
+        return itertools.chain(*generators), events
+
+    raise ValueError(f"Unknown scenario '{scenario}', expected one of {SCENARIOS}")
+
+
+def generate_video(path, scenario, width, height, fps=25, duration=60, seed=0):
+    """
+    Writes a synthetic video and returns its known transition frame indices.
+
+    Args:
+        path (str): Output .mp4 path.
+        scenario (str): One of SCENARIOS.
+        width (int): Frame width.
+        height (int): Frame height.
+        fps (int): Frame rate.
+        duration (float): Length in seconds.
+        seed (int): Seed making the video deterministic.
+
+    Returns:
+        list: Frame indices where the content changes.
+    """
+    frames, events = _scenario_frames(scenario, width, height, fps, duration, seed)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    for frame in frames:
+        writer.write(np.ascontiguousarray(frame))
+    writer.release()
+    return events
+
+
+def match_events(detected, events, tolerance):
+    """
+    Matches detected keyframes to known transitions one-to-one within a tolerance.
+
+    Returns:
+        dict: true_positives, precision and recall.
+    """
+    remaining = sorted(events)
+    true_positives = 0
+    for frame_index in sorted(detected):
+        for event in remaining:
+            if abs(frame_index - event) <= tolerance:
+                remaining.remove(event)
+                true_positives += 1
+                break
+    precision = true_positives / len(detected) if detected else (1.0 if not events else 0.0)
+    recall = true_positives / len(events) if events else 1.0
+    return {"true_positives": true_positives, "precision": precision, "recall": recall}
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def _run_trial(video_path, params, results):
+    """Runs one detection in a fresh process so peak memory is measured per configuration."""
+    baseline_rss = _peak_rss_mb()
+    tracemalloc.start()
+    start = time.perf_counter()
+    keyframes = detect_keyframes(video_path, **params)
+    elapsed = time.perf_counter() - start
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    results.put({
+        "keyframes": [keyframe[0] for keyframe in keyframes],
+        "elapsed": elapsed,
+        "traced_peak_mb": traced_peak / 1024 / 1024,
+        "baseline_rss_mb": baseline_rss,
+        "peak_rss_mb": _peak_rss_mb(),
+    })
+
+
+def run_trial(video_path, params):
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_run_trial, args=(video_path, params, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def _parse_list(value, cast):
+    return [cast(item) for item in value.split(",") if item]
+
+
+def _parse_resolution(value):
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+def compare_to_baseline(results, baseline_path, max_slowdown):
+    """Returns the configurations whose frames/sec dropped by more than max_slowdown relative to the baseline."""
+    def config_key(result):
+        return json.dumps({key: result[key] for key in ("scenario", "resolution", "duration", "fps", "params")}, sort_keys=True)
+
+    with open(baseline_path) as f:
+        baseline = {config_key(result): result for result in map(json.loads, f) if "frames_per_second" in result}
+    regressions = []
+    for result in results:
+        previous = baseline.get(config_key(result))
+        if previous and result["frames_per_second"] < previous["frames_per_second"] * (1 - max_slowdown):
+            regressions.append({"config": json.loads(config_key(result)),
+                                "baseline_fps": previous["frames_per_second"],
+                                "fps": result["frames_per_second"]})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--resolutions", default="640x360,1280x720")
+    parser.add_argument("--durations", default="60", help="Video lengths in seconds")
+    parser.add_argument("--fps", type=int, default=25)
+    parser.add_argument("--skip-frames", default="2")
+    parser.add_argument("--downsample-ratios", default="0.5")
+    parser.add_argument("--motion-thresholds", default="0.2")
+    parser.add_argument("--hist-thresholds", default="50")
+    parser.add_argument("--min-scene-lengths", default="2", help="Seconds; synthetic scenes last 6 s")
+    parser.add_argument("--detectors", default="flow,cascade")
+    parser.add_argument("--workers", default="1")
+    parser.add_argument("--sample-intervals", default="0",
+                        help="Seconds between coarse samples for adaptive sampling; 0 uses the skip-frames stride")
+    parser.add_argument("--tolerance", type=float, default=1.0, help="Seconds a keyframe may be off a transition")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--video-dir", help="Keep generated videos here instead of a temporary directory")
+    parser.add_argument("--output", help="Write JSON lines here instead of stdout")
+    parser.add_argument("--baseline", help="Previous JSON lines output to compare frames/sec against")
+    parser.add_argument("--max-slowdown", type=float, default=0.2, help="Allowed relative frames/sec drop vs the baseline")
+    args = parser.parse_args(argv)
+
+    grid = [
+        dict(zip(("skip_frames", "downsample_ratio", "motion_threshold", "hist_threshold", "min_scene_length",
+                  "detector", "workers", "sample_interval"), values))
+        for values in itertools.product(
+            _parse_list(args.skip_frames, int), _parse_list(args.downsample_ratios, float),
+            _parse_list(args.motion_thresholds, float), _parse_list(args.hist_thresholds, float),
+            _parse_list(args.min_scene_lengths, float), _parse_list(args.detectors, str),
+            _parse_list(args.workers, int), _parse_list(args.sample_intervals, float))
+    ]
+    # Stride runs keep the parameter set of earlier result files so baselines still match
+    for params in grid:
+        if not params["sample_interval"]:
+            del params["sample_interval"]
+
+    video_dir = args.video_dir or tempfile.mkdtemp(prefix="keyframe_bench_")
+    os.makedirs(video_dir, exist_ok=True)
+    output = open(args.output, "w") if args.output else sys.stdout
+    results = []
+
+    try:
+        for scenario, resolution, duration in itertools.product(
+                _parse_list(args.scenarios, str), _parse_list(args.resolutions, _parse_resolution),
+                _parse_list(args.durations, float)):
+            width, height = resolution
+            video_path = os.path.join(video_dir, f"{scenario}_{width}x{height}_{duration:g}s_{args.seed}.mp4")
+            events = generate_video(video_path, scenario, width, height, args.fps, duration, args.seed)
+            total_frames = int(duration * args.fps)
+
+            for params in grid:
+                trial = run_trial(video_path, params)
+                result = {
+                    "scenario": scenario,
+                    "resolution": f"{width}x{height}",
+                    "duration": duration,
+                    "fps": args.fps,
+                    "params": params,
+                    "frames": total_frames,
+                    "seconds": trial["elapsed"],
+                    "frames_per_second": total_frames / trial["elapsed"],
+                    "realtime_factor": duration / trial["elapsed"],
+                    "traced_peak_mb": trial["traced_peak_mb"],
+                    "baseline_rss_mb": trial["baseline_rss_mb"],
+                    "peak_rss_mb": trial["peak_rss_mb"],
+                    "events": events,
+                    "keyframes": trial["keyframes"],
+                }
+                result.update(match_events(trial["keyframes"], events, args.tolerance * args.fps))
+                results.append(result)
+                output.write(json.dumps(result) + "\n")
+                output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    if args.baseline:
+        regressions = compare_to_baseline(results, args.baseline, args.max_slowdown)
+        for regression in regressions:
+            print(f"Regression: {json.dumps(regression)}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+"""
+End-to-end load test of the upload API with synthetic lecture videos.
+
+Generates synthetic slide videos (with a generated audio track so the
+transcription stage has something to decode), fires concurrent POST /upload
+requests at a running app, follows each job until it finishes and reports
+throughput, p50/p95/p99 end-to-end latency and a per-stage breakdown taken
+from the job status and the /metrics histograms.
+
+Usage (from the repository root, with the app pointed at the local stand-in):
+    python -m benchmarks.fake_groq_server --port 8001 &
+    GROQ_BASE_URL=http://localhost:8001 GROQ_API_KEY=test python app.py &
+    python -m benchmarks.load_test --url http://localhost:5000 --requests 20 --concurrency 4
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.keyframe_benchmark import generate_video
+
+STAGE_SUM_PATTERN = re.compile(r'^pipeline_stage_seconds_(sum|count)\{stage="([^"]+)"\} (\S+)$', re.MULTILINE)
+
+
+def make_video(path, scenario, width, height, fps, duration, seed):
+    """Writes a synthetic video and muxes a tone into it with ffmpeg, since cv2.VideoWriter writes no audio."""
+    silent_path = f"{path}.silent.mp4"
+    generate_video(silent_path, scenario, width, height, fps, duration, seed)
+    cmd = [
+        "ffmpeg", "-nostdin", "-y", "-loglevel", "error",
+        "-i", silent_path,
+        "-f", "lavfi", "-i", f"sine=frequency={220 + 40 * seed}:duration={duration}",
+        "-c:v", "copy", "-c:a", "aac", "-shortest", path,
+    ]
+    subprocess.run(cmd, check=True)
+    os.remove(silent_path)
+    return path
+
+
+def _request(method, url, data=None, headers=None, timeout=60):
+    """Sends a request and returns (status, parsed JSON or text body)."""
+    req = urllib.request.Request(url, data=data, headers=headers or {}, method=method)
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            status, body = response.status, response.read()
+    except urllib.error.HTTPError as e:
+        status, body = e.code, e.read()
+    try:
+        return status, json.loads(body)
+    except ValueError:
+        return status, body.decode(errors="replace")
+
+
+def _multipart(field, filename, content):
+    boundary = uuid.uuid4().hex
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"{field}\"; filename=\"{filename}\"\r\n"
+            f"Content-Type: video/mp4\r\n\r\n").encode() + content + f"\r\n--{boundary}--\r\n".encode()
+    return body, {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+
+
+def run_request(base_url, video_path, use_cache, poll_interval, timeout):
+    """
+    Uploads one video, waits for its job and returns the timings of the run.
+
+    Returns:
+        dict: Outcome ("completed", "failed", "rejected", "error" or "timeout"), upload and end-to-end seconds,
+        queue wait and per-stage seconds.
+    """
+    with open(video_path, "rb") as f:
+        body, headers = _multipart("video", os.path.basename(video_path), f.read())
+    record = {"video": os.path.basename(video_path)}
+    start = time.perf_counter()
+    status, response = _request("POST", f"{base_url}/upload{'' if use_cache else '?nocache=1'}", body, headers)
+    record["upload_seconds"] = time.perf_counter() - start
+    if status == 503:
+        return dict(record, outcome="rejected")
+    if status != 202:
+        return dict(record, outcome="error", error=f"{status}: {response}")
+
+    job_id = response["job_id"]
+    deadline = start + timeout
+    while True:
+        status, job = _request("GET", f"{base_url}/jobs/{job_id}")
+        if status == 200 and job["status"] in ("completed", "failed"):
+            break
+        if time.perf_counter() > deadline:
+            return dict(record, job_id=job_id, outcome="timeout", seconds=time.perf_counter() - start)
+        time.sleep(poll_interval)
+
+    record.update(job_id=job_id, outcome=job["status"], seconds=time.perf_counter() - start,
+                  queue_seconds=(job["started_at"] or job["finished_at"]) - job["created_at"])
+    record["stages"] = {
+        stage: entry["finished_at"] - entry["started_at"]
+        for stage, entry in job["stages"].items() if entry["started_at"] and entry["finished_at"]
+    }
+    if job["status"] == "completed":
+        record["timings"] = job["result"].get("timings", {})
+    else:
+        record["error"] = job["error"]
+    return record
+
+
+def percentile(values, q):
+    """Returns the q-th percentile (0-100) of values with linear interpolation."""
+    values = sorted(values)
+    if not values:
+        return None
+    position = (len(values) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+def _distribution(values):
+    return {"p50": percentile(values, 50), "p95": percentile(values, 95), "p99": percentile(values, 99),
+            "max": max(values) if values else None}
+
+
+def scrape_stage_seconds(base_url):
+    """Returns stage -> [total seconds, count] from the pipeline_stage_seconds histogram on /metrics."""
+    status, text = _request("GET", f"{base_url}/metrics")
+    stages = {}
+    if status != 200 or not isinstance(text, str):
+        return stages
+    for kind, stage, value in STAGE_SUM_PATTERN.findall(text):
+        entry = stages.setdefault(stage, [0.0, 0])
+        if kind == "sum":
+            entry[0] = float(value)
+        else:
+            entry[1] = int(float(value))
+    return stages
+
+
+def summarize_results(records, wall_seconds, metrics_before, metrics_after):
+    """Aggregates per-request records into throughput, latency percentiles and a per-stage breakdown."""
+    completed = [record for record in records if record["outcome"] == "completed"]
+    outcomes = {}
+    for record in records:
+        outcomes[record["outcome"]] = outcomes.get(record["outcome"], 0) + 1
+
+    stage_names = sorted({stage for record in completed for stage in record["stages"]})
+    metric_stages = {}
+    for stage, (total, count) in metrics_after.items():
+        before_total, before_count = metrics_before.get(stage, (0.0, 0))
+        if count > before_count:
+            metric_stages[stage] = {"count": count - before_count,
+                                    "mean_seconds": (total - before_total) / (count - before_count)}
+
+    return {
+        "requests": len(records),
+        "outcomes": outcomes,
+        "wall_seconds": wall_seconds,
+        "throughput_per_minute": 60 * len(completed) / wall_seconds if wall_seconds else None,
+        "latency_seconds": _distribution([record["seconds"] for record in completed]),
+        "upload_seconds": _distribution([record["upload_seconds"] for record in records]),
+        "queue_seconds": _distribution([record["queue_seconds"] for record in completed]),
+        "stage_seconds": {
+            stage: _distribution([record["stages"][stage] for record in completed if stage in record["stages"]])
+            for stage in stage_names
+        },
+        "metrics_stage_seconds": metric_stages,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:5000", help="Base URL of the running app")
+    parser.add_argument("--requests", type=int, default=20, help="Total uploads")
+    parser.add_argument("--concurrency", type=int, default=4, help="Uploads in flight at once")
+    parser.add_argument("--videos", type=int, default=4, help="Distinct synthetic videos, uploaded round robin")
+    parser.add_argument("--scenario", default="slides", help="Synthetic video scenario, see keyframe_benchmark")
+    parser.add_argument("--resolution", default="1280x720")
+    parser.add_argument("--duration", type=float, default=60, help="Video length in seconds")
+    parser.add_argument("--fps", type=int, default=25)
+    parser.add_argument("--cache", action="store_true", help="Let repeated videos hit the stage cache")
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    parser.add_argument("--timeout", type=float, default=1800, help="Seconds to wait for one job")
+    parser.add_argument("--video-dir", help="Keep generated videos here instead of a temporary directory")
+    parser.add_argument("--output", help="Write per-request JSON lines here")
+    args = parser.parse_args(argv)
+
+    width, height = (int(value) for value in args.resolution.lower().split("x"))
+    video_dir = args.video_dir or tempfile.mkdtemp(prefix="load_test_")
+    os.makedirs(video_dir, exist_ok=True)
+    videos = []
+    for seed in range(args.videos):
+        path = os.path.join(video_dir, f"{args.scenario}_{width}x{height}_{args.duration:g}s_{seed}.mp4")
+        videos.append(path if os.path.exists(path) else
+                      make_video(path, args.scenario, width, height, args.fps, args.duration, seed))
+
+    base_url = args.url.rstrip("/")
+    metrics_before = scrape_stage_seconds(base_url)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        futures = [executor.submit(run_request, base_url, videos[i % len(videos)], args.cache, args.poll_interval,
+                                   args.timeout)
+                   for i in range(args.requests)]
+        records = []
+        for future in futures:
+            try:
+                records.append(future.result())
+            except Exception as e:
+                records.append({"outcome": "error", "error": str(e), "upload_seconds": 0.0})
+    wall_seconds = time.perf_counter() - start
+
+    if args.output:
+        with open(args.output, "w") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+    summary = summarize_results(records, wall_seconds, metrics_before, scrape_stage_seconds(base_url))
+    print(json.dumps(summary, indent=2))
+    return 0 if summary["outcomes"].get("completed", 0) == len(records) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
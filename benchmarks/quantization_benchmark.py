@@ -0,0 +1,214 @@
+"""
+Full precision vs int8 dynamic quantization benchmark for Whisper and BART on the CPU.
+
+Each model variant runs in a fresh process so load time and peak memory are
+measured per variant. Quality is reported as word error rate for Whisper and
+token F1 for BART, against reference texts when given and against the fp32
+output otherwise. Results are written as JSON lines, one per model variant.
+
+Usage (from the repository root):
+    python -m benchmarks.quantization_benchmark --audio sample/example2.mp4 --whisper-model base
+    python -m benchmarks.quantization_benchmark --audio a.mp4,b.mp4 --references a.txt,b.txt --repeats 3
+    python -m benchmarks.quantization_benchmark --bart-model ./models/bart-fine-tuned-mts --bart-inputs notes1.txt,notes2.txt
+"""
+import argparse
+import json
+import multiprocessing
+import re
+import statistics
+import sys
+import time
+from collections import Counter
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def _words(text):
+    return re.findall(r"[a-z0-9']+", text.lower())
+
+
+def word_error_rate(reference, hypothesis):
+    """Word-level edit distance between two texts divided by the number of reference words."""
+    ref, hyp = _words(reference), _words(hypothesis)
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hyp, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1] / len(ref) if ref else float(bool(hyp))
+
+
+def token_f1(reference, hypothesis):
+    """Bag-of-words F1 between two texts, as used for extractive QA and summary overlap."""
+    ref, hyp = Counter(_words(reference)), Counter(_words(hypothesis))
+    overlap = sum((ref & hyp).values())
+    if not overlap:
+        return 0.0
+    precision, recall = overlap / sum(hyp.values()), overlap / sum(ref.values())
+    return 2 * precision * recall / (precision + recall)
+
+
+def _timed_runs(func, repeats):
+    """Calls func repeats times after one warm-up call and returns (last output, median seconds)."""
+    output = func()
+    seconds = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        output = func()
+        seconds.append(time.perf_counter() - start)
+    return output, statistics.median(seconds)
+
+
+def _run_whisper(model_size, quantize, audio_paths, repeats, results):
+    from modules.models import AUDIO_SAMPLE_RATE, _model_nbytes, decode_audio, load_whisper_model
+
+    audios = [decode_audio(path) for path in audio_paths]
+    baseline_rss = _peak_rss_mb()
+    start = time.perf_counter()
+    model = load_whisper_model(model_size, quantize=quantize)
+    load_seconds = time.perf_counter() - start
+
+    items = []
+    for path, audio in zip(audio_paths, audios):
+        result, seconds = _timed_runs(lambda: model.transcribe(audio, fp16=False), repeats)
+        items.append({"input": path, "seconds": seconds, "audio_seconds": len(audio) / AUDIO_SAMPLE_RATE,
+                      "text": result["text"].strip()})
+    results.put({"load_seconds": load_seconds, "model_mb": _model_nbytes(model) / 1024 / 1024,
+                 "baseline_rss_mb": baseline_rss, "peak_rss_mb": _peak_rss_mb(), "items": items})
+
+
+def _run_bart(model_path, quantize, texts, repeats, results):
+    import torch
+    from transformers import BartForConditionalGeneration, BartTokenizer
+    from modules.models import _model_nbytes, quantize_linear_layers
+
+    baseline_rss = _peak_rss_mb()
+    start = time.perf_counter()
+    tokenizer = BartTokenizer.from_pretrained(model_path)
+    model = BartForConditionalGeneration.from_pretrained(model_path).eval()
+    if quantize:
+        model = quantize_linear_layers(model)
+    load_seconds = time.perf_counter() - start
+
+    def summarize(text):
+        # Same generation settings as the /summarize endpoint
+        inputs = tokenizer(text, return_tensors="pt", max_length=4096, truncation=True)
+        with torch.inference_mode():
+            outputs = model.generate(inputs["input_ids"], attention_mask=inputs["attention_mask"], max_length=900,
+                                     min_length=100, num_beams=4, early_stopping=True, length_penalty=1.0)
+        return tokenizer.decode(outputs[0], skip_special_tokens=True)
+
+    items = []
+    for index, text in enumerate(texts):
+        summary, seconds = _timed_runs(lambda: summarize(text), repeats)
+        items.append({"input": index, "seconds": seconds, "text": summary})
+    results.put({"load_seconds": load_seconds, "model_mb": _model_nbytes(model) / 1024 / 1024,
+                 "baseline_rss_mb": baseline_rss, "peak_rss_mb": _peak_rss_mb(), "items": items})
+
+
+def run_variant(target, *args):
+    """Runs one model variant in a fresh process and returns its measurements."""
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=target, args=args + (results,))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def _read_texts(paths):
+    texts = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            texts.append(f.read())
+    return texts
+
+
+def _report(model, variant, measured, references, score_name, score, baseline=None):
+    """Builds the JSON result of a variant, scoring each output against its reference or the fp32 output."""
+    items = []
+    for index, item in enumerate(measured["items"]):
+        reference = references[index] if references else (baseline["items"][index]["text"] if baseline else None)
+        if reference is not None:
+            item = dict(item, **{score_name: score(reference, item["text"])})
+        items.append(item)
+    summary = {
+        "model": model,
+        "variant": variant,
+        "quality_reference": "references" if references else ("fp32" if baseline else None),
+        "load_seconds": measured["load_seconds"],
+        "model_mb": measured["model_mb"],
+        "baseline_rss_mb": measured["baseline_rss_mb"],
+        "peak_rss_mb": measured["peak_rss_mb"],
+        "total_seconds": sum(item["seconds"] for item in items),
+        "items": items,
+    }
+    scores = [item[score_name] for item in items if score_name in item]
+    if scores:
+        summary[f"mean_{score_name}"] = statistics.mean(scores)
+    if baseline:
+        summary["speedup"] = sum(item["seconds"] for item in baseline["items"]) / summary["total_seconds"]
+        summary["memory_ratio"] = measured["model_mb"] / baseline["model_mb"]
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--audio", default="", help="Comma-separated audio or video files to transcribe")
+    parser.add_argument("--references", default="", help="Comma-separated reference transcripts, one per audio file")
+    parser.add_argument("--whisper-model", default="base")
+    parser.add_argument("--bart-model", help="Path of the BART checkpoint used by /summarize")
+    parser.add_argument("--bart-inputs", default="", help="Comma-separated text files to summarize")
+    parser.add_argument("--bart-references", default="", help="Comma-separated reference summaries, one per input")
+    parser.add_argument("--repeats", type=int, default=1, help="Timed runs per input after one warm-up run")
+    parser.add_argument("--output", help="Write JSON lines here instead of stdout")
+    args = parser.parse_args(argv)
+
+    audio_paths = [path for path in args.audio.split(",") if path]
+    bart_paths = [path for path in args.bart_inputs.split(",") if path]
+    if not audio_paths and not (args.bart_model and bart_paths):
+        parser.error("give --audio and/or --bart-model with --bart-inputs")
+
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        if audio_paths:
+            references = _read_texts([path for path in args.references.split(",") if path])
+            if references and len(references) != len(audio_paths):
+                parser.error("--references needs one file per --audio file")
+            fp32 = run_variant(_run_whisper, args.whisper_model, False, audio_paths, args.repeats)
+            int8 = run_variant(_run_whisper, args.whisper_model, True, audio_paths, args.repeats)
+            model = f"whisper-{args.whisper_model}"
+            output.write(json.dumps(_report(model, "fp32", fp32, references, "wer", word_error_rate)) + "\n")
+            output.write(json.dumps(_report(model, "int8", int8, references, "wer", word_error_rate, fp32)) + "\n")
+            output.flush()
+
+        if args.bart_model and bart_paths:
+            texts = _read_texts(bart_paths)
+            references = _read_texts([path for path in args.bart_references.split(",") if path])
+            if references and len(references) != len(texts):
+                parser.error("--bart-references needs one file per --bart-inputs file")
+            fp32 = run_variant(_run_bart, args.bart_model, False, texts, args.repeats)
+            int8 = run_variant(_run_bart, args.bart_model, True, texts, args.repeats)
+            output.write(json.dumps(_report("bart", "fp32", fp32, references, "token_f1", token_f1)) + "\n")
+            output.write(json.dumps(_report("bart", "int8", int8, references, "token_f1", token_f1, fp32)) + "\n")
+            output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+
+# Disk cache for per-stage pipeline results, bounded by total size
+CACHE_DIR = os.getenv("PIPELINE_CACHE_DIR", "cache")
+CACHE_MAX_BYTES = int(os.getenv("PIPELINE_CACHE_MAX_BYTES", str(5 * 1024 ** 3)))
+
+_eviction_lock = threading.Lock()
+
+
+def hash_file(path, chunk_size=1024 * 1024):
+    """
+    Computes the SHA-256 of a file without loading it into memory.
+
+    Args:
+        path (str): Path to the file.
+        chunk_size (int): Number of bytes read at a time.
+
+    Returns:
+        str: Hex digest of the file contents.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def stage_key(content_hash, stage, **params):
+    """
+    Builds the cache key of a pipeline stage from the input hash and the stage parameters.
+
+    Args:
+        content_hash (str): Hash of the stage input, usually the video bytes.
+        stage (str): Name of the pipeline stage.
+        **params: Everything else the stage output depends on (thresholds, model names, prompts...).
+
+    Returns:
+        str: Hex digest identifying the stage output.
+    """
+    payload = json.dumps({"input": content_hash, "stage": stage, "params": params}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class StageCache:
+    """
+    Content-addressed, size-bounded disk cache for pipeline stage outputs.
+
+    Each entry is a pickle named after its key. Reads refresh the entry's
+    modification time so eviction drops the least recently used entries
+    first once the cache grows beyond max_bytes.
+
+    Args:
+        root (str): Directory holding the cache entries.
+        max_bytes (int): Size budget for the whole cache directory.
+        bypass (bool): When True every lookup misses, so stages are recomputed and their fresh results stored.
+    """
+
+    def __init__(self, root=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, bypass=False):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.bypass = bypass
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], f"{key}.pkl")
+
+    def get(self, key):
+        """
+        Looks up a stage output.
+
+        Returns:
+            tuple: (hit, value), where value is None on a miss.
+        """
+        if self.bypass:
+            return False, None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except Exception:
+            # Unreadable, truncated or stale entries (e.g. pickled classes that were since renamed) are misses
+            return False, None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return True, value
+
+    def put(self, key, value):
+        """Stores a stage output, replacing any previous entry atomically."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.evict()
+
+    def evict(self):
+        """Deletes least recently used entries until the cache fits in max_bytes."""
+        with _eviction_lock:
+            entries = []
+            for dirpath, _, filenames in os.walk(self.root):
+                for filename in filenames:
+                    if not filename.endswith(".pkl"):
+                        continue
+                    path = os.path.join(dirpath, filename)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
@@ -1,37 +1,519 @@
 import cv2
 import os
+import math
+import multiprocessing
 import numpy as np
+import queue
+import tempfile
+import threading
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from modules.metrics import increment
+from modules.utils import JPEG_QUALITY, EncodedFrame, SpilledFrame, load_frame
 
-def detect_keyframes(video_path, motion_threshold=0.2, hist_threshold=50, min_scene_length=10, skip_frames=2, downsample_ratio=0.5):
+# Maximum Hamming distance between the dHashes of two keyframes considered to show the same content
+DEDUP_DISTANCE = int(os.getenv("KEYFRAME_DEDUP_DISTANCE", "5"))
+
+# Number of processes detect_keyframes splits a video across by default
+KEYFRAME_WORKERS = int(os.getenv("KEYFRAME_WORKERS", "1"))
+
+# Default change detector, and the cascade's thumbnail size and static-frame threshold (mean absolute gray-level difference)
+KEYFRAME_DETECTOR = os.getenv("KEYFRAME_DETECTOR", "cascade")
+THUMBNAIL_SIZE = (32, 18)
+STATIC_FRAME_DIFF = float(os.getenv("KEYFRAME_STATIC_DIFF", "1.0"))
+
+# How keyframe images are held: "array" (BGR ndarray), "jpeg" (EncodedFrame) or "disk" (SpilledFrame)
+KEYFRAME_STORAGES = ("array", "jpeg", "disk")
+
+# Keyframes decoded per task when the parallel scan reads back accepted frames
+READ_BATCH_SIZE = 4
+
+# Sampled frames the decode thread may run ahead of change detection in the serial scan
+DECODE_QUEUE_SIZE = int(os.getenv("KEYFRAME_DECODE_QUEUE", "4"))
+
+# Adaptive sampling: forward gaps up to this many frames are decoded through instead of seeked,
+# since a seek decodes from the previous codec keyframe anyway; brackets this short are scanned linearly
+SEEK_MIN_FRAMES = int(os.getenv("KEYFRAME_SEEK_MIN_FRAMES", "48"))
+
+
+def dhash(gray_frame, hash_size=8):
+    """
+    Computes the difference hash of a grayscale frame.
+
+    Args:
+        gray_frame (ndarray): Grayscale image, typically the downsampled frame used for detection.
+        hash_size (int): Side of the hash grid; the hash has hash_size * hash_size bits.
+
+    Returns:
+        int: The perceptual hash packed into an integer.
+    """
+    resized = cv2.resize(gray_frame, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = resized[:, 1:] > resized[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming_distance(hash_a, hash_b):
+    """Returns the number of differing bits between two perceptual hashes."""
+    return bin(hash_a ^ hash_b).count("1")
+
+
+def iter_unique_keyframes(keyframes, max_distance=DEDUP_DISTANCE, duplicates=None):
+    """
+    Yields keyframes, skipping those that duplicate an earlier one.
+
+    A keyframe is dropped when its dHash is within max_distance bits of an
+    already kept keyframe, such as the same slide re-triggered by a cursor
+    move. Keyframes may carry a precomputed hash as a third tuple element
+    (see detect_keyframes(return_hashes=True)); otherwise it is computed here.
+
+    Args:
+        keyframes (iterable): Tuples (frame_index, frame_image) or (frame_index, frame_image, frame_hash).
+        max_distance (int): Maximum Hamming distance for two frames to count as duplicates.
+        duplicates (dict): Optional dict filled with dropped frame index -> index of the frame it duplicates.
+
+    Yields:
+        tuple: The kept (frame_index, frame_image) tuples.
+    """
+    kept_hashes = []
+
+    for keyframe in keyframes:
+        frame_index, frame_image = keyframe[0], keyframe[1]
+        if len(keyframe) > 2:
+            frame_hash = keyframe[2]
+        else:
+            frame_hash = dhash(cv2.cvtColor(load_frame(frame_image), cv2.COLOR_BGR2GRAY))
+
+        representative = None
+        for kept_index, kept_hash in kept_hashes:
+            if hamming_distance(frame_hash, kept_hash) <= max_distance:
+                representative = kept_index
+                break
+
+        if representative is None:
+            kept_hashes.append((frame_index, frame_hash))
+            yield frame_index, frame_image
+        elif duplicates is not None:
+            duplicates[frame_index] = representative
+
+
+FrameFeatures = namedtuple("FrameFeatures", ["gray", "hist", "thumb"])
+
+
+def _frame_features(frame, downsample_ratio):
+    """Returns the downsampled grayscale frame, its intensity histogram and a tiny thumbnail for cheap differencing."""
+    resized = cv2.resize(frame, None, fx=downsample_ratio, fy=downsample_ratio)
+    gray = cv2.cvtColor(resized, cv2.COLOR_BGR2GRAY)
+    hist = cv2.calcHist([gray], [0], None, [256], [0, 256])
+    thumb = cv2.resize(gray, THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+    return FrameFeatures(gray, hist, thumb)
+
+
+class _FrameSlot:
+    """Reusable buffers for one decoded frame and its detection features, filled in place frame after frame."""
+
+    __slots__ = ("frame", "resized", "gray", "hist", "thumb")
+
+    def __init__(self):
+        self.frame = self.resized = self.gray = self.hist = self.thumb = None
+
+    def features(self, downsample_ratio):
+        """Computes the same features as _frame_features from self.frame, writing into the slot's buffers."""
+        # OpenCV reuses a dst array that already has the right size and type, so only the first frame allocates
+        self.resized = cv2.resize(self.frame, None, dst=self.resized, fx=downsample_ratio, fy=downsample_ratio)
+        self.gray = cv2.cvtColor(self.resized, cv2.COLOR_BGR2GRAY, dst=self.gray)
+        self.hist = cv2.calcHist([self.gray], [0], None, [256], [0, 256], hist=self.hist)
+        self.thumb = cv2.resize(self.gray, THUMBNAIL_SIZE, dst=self.thumb, interpolation=cv2.INTER_AREA)
+        return FrameFeatures(self.gray, self.hist, self.thumb)
+
+
+def _mean_flow_magnitude(prev, curr):
+    flow = cv2.calcOpticalFlowFarneback(prev.gray, curr.gray, None, 0.5, 3, 15, 3, 5, 1.2, 0)
+    mag, _ = cv2.cartToPolar(flow[..., 0], flow[..., 1])
+    return mag.mean()
+
+
+def flow_detector(prev, curr, motion_threshold, hist_threshold):
+    """Flags a change when the optical flow magnitude or the histogram difference crosses its threshold."""
+    # Motion detection
+    mean_magnitude = _mean_flow_magnitude(prev, curr)
+
+    # Histogram difference
+    hist_diff = cv2.compareHist(prev.hist, curr.hist, cv2.HISTCMP_CHISQR)
+
+    return mean_magnitude > motion_threshold or hist_diff > hist_threshold
+
+
+def cascade_detector(prev, curr, motion_threshold, hist_threshold):
+    """
+    Tiered version of flow_detector that only runs dense optical flow when cheaper signals cannot decide.
+
+    A histogram difference over the threshold is a change on its own, exactly
+    as in flow_detector. A thumbnail whose mean absolute difference stays
+    under STATIC_FRAME_DIFF is treated as static without computing flow;
+    this covers most frames of a slide lecture and is the only place the
+    result can differ from flow_detector.
+    """
+    if cv2.compareHist(prev.hist, curr.hist, cv2.HISTCMP_CHISQR) > hist_threshold:
+        return True
+    if cv2.absdiff(prev.thumb, curr.thumb).mean() < STATIC_FRAME_DIFF:
+        return False
+    return _mean_flow_magnitude(prev, curr) > motion_threshold
+
+
+# Change detectors selectable by name through detect_keyframes(detector=...)
+DETECTORS = {
+    "flow": flow_detector,
+    "cascade": cascade_detector,
+}
+
+
+def _get_detector(name):
+    try:
+        return DETECTORS[name]
+    except KeyError:
+        raise ValueError(f"Unknown keyframe detector '{name}', expected one of {sorted(DETECTORS)}") from None
+
+
+def _store_frame(frame_index, frame_image, storage, jpeg_quality, spill_dir):
+    """Converts a decoded keyframe into the requested storage form."""
+    if storage == "jpeg":
+        return EncodedFrame.from_image(frame_image, jpeg_quality)
+    if storage == "disk":
+        return SpilledFrame.from_image(frame_image, os.path.join(spill_dir, f"keyframe_{frame_index}.jpg"), jpeg_quality)
+    return frame_image
+
+
+def video_frame_count(video_path):
+    """Returns the frame count from the container header, or None if it is unknown."""
+    video = cv2.VideoCapture(video_path)
+    frame_count = int(video.get(cv2.CAP_PROP_FRAME_COUNT)) if video.isOpened() else 0
+    video.release()
+    return frame_count if frame_count > 0 else None
+
+
+def detect_keyframes(video_path, motion_threshold=0.2, hist_threshold=50, min_scene_length=10, skip_frames=2, downsample_ratio=0.5,
+                     return_hashes=False, workers=KEYFRAME_WORKERS, detector=KEYFRAME_DETECTOR, storage="array",
+                     jpeg_quality=JPEG_QUALITY, spill_dir=None, sample_interval=None):
     """
     Detects keyframes in a video based on optical flow magnitude and histogram analysis.
 
     Args:
         video_path (str): Path to the video file.
-        threshold (float): Optical flow magnitude threshold to detect significant motion.
+        motion_threshold (float): Optical flow magnitude threshold to detect significant motion.
+        hist_threshold (float): Chi-square histogram distance threshold to detect a change of scene.
         min_scene_length (int): Minimum time between consecutive keyframes in seconds.
         skip_frames (int): Number of frames to skip for efficiency.
         downsample_ratio (float): Factor by which to downsample frames for faster processing.
+        return_hashes (bool): Also return the dHash of each keyframe, computed from the downsampled gray frame.
+        workers (int): Number of processes to split the video across; see detect_keyframes_parallel.
+        detector (str): Name of the change detector in DETECTORS. "cascade" skips optical flow on frames that the
+            histogram and thumbnail differences already settle; "flow" always computes it.
+        storage (str): How keyframe images are held, see iter_keyframes.
+        jpeg_quality (int): JPEG quality for the "jpeg" and "disk" storages.
+        spill_dir (str): Directory for the "disk" storage.
+        sample_interval (float): Seconds between coarse samples for adaptive sampling, which replaces the
+            skip_frames stride and the workers split; see iter_keyframes. None keeps the fixed stride.
 
     Returns:
-        list: A list of tuples (frame_index, frame_image) for detected keyframes.
+        list: A list of tuples (frame_index, frame_image) for detected keyframes, or (frame_index, frame_image, frame_hash) with return_hashes.
     """
-    
+    return list(iter_keyframes(video_path, motion_threshold, hist_threshold, min_scene_length, skip_frames, downsample_ratio,
+                               return_hashes, workers, detector, storage, jpeg_quality, spill_dir, sample_interval))
+
+
+def iter_keyframes(video_path, motion_threshold=0.2, hist_threshold=50, min_scene_length=10, skip_frames=2, downsample_ratio=0.5,
+                   return_hashes=False, workers=KEYFRAME_WORKERS, detector=KEYFRAME_DETECTOR, storage="array",
+                   jpeg_quality=JPEG_QUALITY, spill_dir=None, sample_interval=None):
+    """
+    Yields keyframes as they are found, so memory use does not grow with the length of the video.
+
+    Takes the same detection arguments as detect_keyframes. With storage
+    "jpeg" each image is held as an EncodedFrame (compressed bytes); with
+    "disk" it is written to spill_dir (a fresh temporary directory by
+    default) and held as a SpilledFrame whose file is deleted when the frame
+    is garbage collected. Both decode lazily; use modules.utils.load_frame
+    or frame_to_jpeg to consume any storage form.
+
+    With sample_interval set, frames are sampled coarsely by seeking every
+    sample_interval seconds instead of decoding every skip_frames-th frame,
+    and only when two samples differ is the interval between them bisected
+    down to the exact frame where the change happens. Long static stretches
+    then cost one decode per interval, and keyframes land on the first frame
+    of the new scene rather than on the next stride sample. A change that
+    starts and reverts within one interval is not seen.
+
+    Yields:
+        tuple: (frame_index, frame_image) or (frame_index, frame_image, frame_hash) with return_hashes.
+    """
+    if storage not in KEYFRAME_STORAGES:
+        raise ValueError(f"Unknown keyframe storage '{storage}', expected one of {KEYFRAME_STORAGES}")
+    if storage == "disk" and spill_dir is None:
+        spill_dir = tempfile.mkdtemp(prefix="keyframes_")
+
+    if sample_interval:
+        yield from _iter_keyframes_adaptive(video_path, motion_threshold, hist_threshold, min_scene_length, sample_interval,
+                                            downsample_ratio, return_hashes, detector, storage, jpeg_quality, spill_dir)
+        return
+
+    if workers > 1:
+        yield from _iter_keyframes_parallel(video_path, motion_threshold, hist_threshold, min_scene_length, skip_frames,
+                                            downsample_ratio, return_hashes, workers, detector, storage, jpeg_quality,
+                                            spill_dir)
+        return
+
+    is_scene_change = _get_detector(detector)
     video = cv2.VideoCapture(video_path)
     fps = video.get(cv2.CAP_PROP_FPS)
-    success, prev_frame = video.read()
 
-    if not success:
-        raise ValueError("Error reading the video file.")
+    # Decoding runs in its own thread and fills recycled slots while this
+    # generator runs change detection; OpenCV releases the GIL in both
+    free_slots = queue.Queue()
+    for _ in range(DECODE_QUEUE_SIZE + 2):  # plus the two slots being compared
+        free_slots.put(_FrameSlot())
+    decoded = queue.Queue()
+    stop = threading.Event()
+    decoder = threading.Thread(target=_decode_frames, daemon=True, name="keyframe-decode",
+                               args=(video, skip_frames, downsample_ratio, free_slots, decoded, stop))
+    decoder.start()
 
-    prev_frame = cv2.resize(prev_frame, None, fx=downsample_ratio, fy=downsample_ratio)
-    prev_frame_gray = cv2.cvtColor(prev_frame, cv2.COLOR_BGR2GRAY)
-    prev_hist = cv2.calcHist([prev_frame_gray], [0], None, [256], [0, 256])
-    keyframes = []
-    curr_frame = 0
     last_keyframe = -min_scene_length * fps
+    frames_processed = 0
+
+    try:
+        item = decoded.get()
+        if isinstance(item, Exception):
+            raise item
+        if item is None:
+            raise ValueError("Error reading the video file.")
+        _, prev_slot, prev_features = item
+
+        while True:
+            item = decoded.get()
+            if isinstance(item, Exception):
+                raise item
+            if item is None:
+                break
+            curr_frame, curr_slot, curr_features = item
+            frames_processed += 1
+
+            # Keyframe condition
+            if (curr_frame - last_keyframe) > min_scene_length * fps and is_scene_change(
+                    prev_features, curr_features, motion_threshold, hist_threshold):
+                last_keyframe = curr_frame
+                increment("keyframes_detected_total")
+                # The slot is refilled later, so only keyframes get a full-resolution copy of their own
+                frame_image = curr_slot.frame.copy() if storage == "array" else curr_slot.frame
+                frame = _store_frame(curr_frame, frame_image, storage, jpeg_quality, spill_dir)
+                if return_hashes:
+                    yield curr_frame, frame, dhash(curr_features.gray)
+                else:
+                    yield curr_frame, frame
+
+            free_slots.put(prev_slot)
+            prev_slot, prev_features = curr_slot, curr_features
+    finally:
+        stop.set()
+        decoder.join()
+        video.release()
+        increment("keyframe_frames_processed_total", frames_processed)
 
-    while True:
+
+def _decode_frames(video, skip_frames, downsample_ratio, free_slots, decoded, stop):
+    """
+    Decodes every skip_frames-th frame into recycled slots for the serial scan.
+
+    Puts (frame_index, slot, features) tuples on decoded in order, starting
+    with frame 0, then any exception raised and finally None. Waits for a
+    free slot before each frame, so it runs at most as far ahead as there
+    are slots, and returns once stop is set.
+    """
+    def take_slot():
+        while not stop.is_set():
+            try:
+                return free_slots.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return None
+
+    try:
+        slot = take_slot()
+        if slot is None:
+            return
+        success, slot.frame = video.read(slot.frame)
+        if not success:
+            return
+        decoded.put((0, slot, slot.features(downsample_ratio)))
+
+        curr_frame = 0
+        while True:
+            for _ in range(skip_frames):
+                success = video.grab()
+                curr_frame += 1
+                if not success:
+                    break
+
+            slot = take_slot()
+            if slot is None:
+                return
+            success, slot.frame = video.retrieve(slot.frame)
+            if not success:
+                return
+            decoded.put((curr_frame, slot, slot.features(downsample_ratio)))
+    except Exception as e:
+        decoded.put(e)
+    finally:
+        decoded.put(None)
+
+
+class _FrameReader:
+    """Random access to the frames of an open capture that decodes through short forward gaps instead of seeking."""
+
+    def __init__(self, video):
+        self.video = video
+        self.position = 0  # index of the frame the next read() returns
+
+    def read(self, frame_index):
+        """Returns the BGR frame at frame_index, or None past the end of the stream."""
+        if not self.position <= frame_index <= self.position + SEEK_MIN_FRAMES:
+            self.video.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+            self.position = frame_index
+        while self.position < frame_index:
+            if not self.video.grab():
+                return None
+            self.position += 1
+        success, frame = self.video.read()
+        if not success:
+            return None
+        self.position += 1
+        return frame
+
+
+def _iter_keyframes_adaptive(video_path, motion_threshold, hist_threshold, min_scene_length, sample_interval,
+                             downsample_ratio, return_hashes, detector, storage, jpeg_quality, spill_dir):
+    is_scene_change = _get_detector(detector)
+    video = cv2.VideoCapture(video_path)
+    fps = video.get(cv2.CAP_PROP_FPS)
+    frame_count = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+    reader = _FrameReader(video)
+    step = max(1, round(sample_interval * fps))
+    min_gap = min_scene_length * fps
+    frames_processed = 0
+
+    def sample(frame_index):
+        nonlocal frames_processed
+        frame = reader.read(frame_index)
+        if frame is None:
+            return None, None
+        frames_processed += 1
+        return frame, _frame_features(frame, downsample_ratio)
+
+    def changed(features_a, features_b):
+        return is_scene_change(features_a, features_b, motion_threshold, hist_threshold)
+
+    def locate(lo, lo_features, hi, hi_frame, hi_features):
+        """Returns (frame_index, frame, features) of the first frame of the change between samples lo and hi."""
+        while hi - lo > SEEK_MIN_FRAMES:
+            mid = (lo + hi) // 2
+            mid_frame, mid_features = sample(mid)
+            if mid_frame is None:
+                break
+            if changed(lo_features, mid_features):
+                hi, hi_frame, hi_features = mid, mid_frame, mid_features
+            elif changed(mid_features, hi_features):
+                lo, lo_features = mid, mid_features
+            else:
+                # Neither half changes enough on its own: a gradual transition, keep the sample after it
+                return hi, hi_frame, hi_features
+
+        # Short bracket: decode it straight through and take the first frame that differs from its predecessor
+        prev_features = lo_features
+        for frame_index in range(lo + 1, hi):
+            frame, features = sample(frame_index)
+            if frame is None:
+                break
+            if changed(prev_features, features):
+                return frame_index, frame, features
+            prev_features = features
+        return hi, hi_frame, hi_features
+
+    prev_frame, prev_features = sample(0)
+    if prev_frame is None:
+        video.release()
+        raise ValueError("Error reading the video file.")
+    prev_index = 0
+    last_keyframe = -min_gap
+
+    try:
+        while True:
+            frame_index = prev_index + step
+            frame, features = sample(frame_index)
+            if frame is None and prev_index < frame_count - 1 and frame_index != frame_count - 1:
+                # The last interval is usually partial; compare against the final frame too
+                frame_index = frame_count - 1
+                frame, features = sample(frame_index)
+            if frame is None:
+                break
+
+            # Brackets that end within min_scene_length of the last keyframe cannot yield one, so are not searched
+            lo, lo_features = prev_index, prev_features
+            while frame_index - last_keyframe > min_gap and changed(lo_features, features):
+                change_index, change_frame, change_features = locate(lo, lo_features, frame_index, frame, features)
+                if change_index - last_keyframe > min_gap:
+                    last_keyframe = change_index
+                    increment("keyframes_detected_total")
+                    stored = _store_frame(change_index, change_frame, storage, jpeg_quality, spill_dir)
+                    if return_hashes:
+                        yield change_index, stored, dhash(change_features.gray)
+                    else:
+                        yield change_index, stored
+                    break
+
+                # The change came too soon after the last keyframe (e.g. a fade), but a later one in the same
+                # bracket still can be a keyframe, so the part of the bracket past min_scene_length is searched again
+                lo = max(change_index, math.floor(last_keyframe + min_gap))
+                if lo >= frame_index:
+                    break
+                if lo == change_index:
+                    lo_features = change_features
+                else:
+                    lo_frame, lo_features = sample(lo)
+                    if lo_frame is None:
+                        break
+
+            prev_index, prev_features = frame_index, features
+    finally:
+        video.release()
+        increment("keyframe_frames_processed_total", frames_processed)
+
+
+def _scan_segment(video_path, start_frame, end_frame, motion_threshold, hist_threshold, skip_frames, downsample_ratio,
+                  detector):
+    """
+    Finds every sampled frame in [start_frame, end_frame) that differs from the previous sample.
+
+    Sampling uses the same grid as the serial scan (multiples of skip_frames)
+    and the segment is compared against the sample just before it, so the
+    candidates match what the serial scan would evaluate. min_scene_length
+    is not applied here because it depends on keyframes in earlier segments.
+
+    Returns:
+        tuple: List of (frame_index, frame_hash) candidate keyframes, and the number of frames analysed.
+    """
+    video = cv2.VideoCapture(video_path)
+    curr_frame = max(start_frame - skip_frames, 0)
+    if curr_frame:
+        video.set(cv2.CAP_PROP_POS_FRAMES, curr_frame)
+    success, prev_frame = video.read()
+    if not success:
+        video.release()
+        return [], 0
+
+    is_scene_change = _get_detector(detector)
+    prev_features = _frame_features(prev_frame, downsample_ratio)
+    candidates = []
+    frames_processed = 0
+
+    while end_frame is None or curr_frame + skip_frames < end_frame:
         for _ in range(skip_frames):
             success = video.grab()
             curr_frame += 1
@@ -42,28 +524,177 @@ def detect_keyframes(video_path, motion_threshold=0.2, hist_threshold=50, min_sc
         if not success:
             break
 
-        curr_frame_resized = cv2.resize(curr_frame_img, None, fx=downsample_ratio, fy=downsample_ratio)
-        curr_frame_gray = cv2.cvtColor(curr_frame_resized, cv2.COLOR_BGR2GRAY)
-        curr_hist = cv2.calcHist([curr_frame_gray], [0], None, [256], [0, 256])
+        curr_features = _frame_features(curr_frame_img, downsample_ratio)
+        frames_processed += 1
+        if is_scene_change(prev_features, curr_features, motion_threshold, hist_threshold):
+            candidates.append((curr_frame, dhash(curr_features.gray)))
+
+        prev_features = curr_features
+
+    video.release()
+    return candidates, frames_processed
+
+
+def _read_frames(video_path, frame_indices, encode, jpeg_quality):
+    """Seeks to and decodes the given frames, returning (frame_index, frame_image) tuples, JPEG-encoded if requested."""
+    video = cv2.VideoCapture(video_path)
+    frames = []
+    for frame_index in frame_indices:
+        video.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+        success, frame_image = video.read()
+        if success:
+            frames.append((frame_index, EncodedFrame.from_image(frame_image, jpeg_quality) if encode else frame_image))
+    video.release()
+    return frames
+
+
+def read_keyframes(video_path, keyframes, storage="array", jpeg_quality=JPEG_QUALITY, spill_dir=None):
+    """
+    Decodes previously detected keyframes again by seeking to their frame indices.
+
+    Lets callers keep only (frame_index, frame_hash) pairs, e.g. in a cache,
+    instead of the images themselves. Seeking is frame-accurate for the usual
+    constant frame rate files; see detect_keyframes_parallel for the
+    tolerance on other containers.
+
+    Args:
+        video_path (str): Path to the video file.
+        keyframes (iterable): (frame_index, frame_hash) pairs in frame order.
+        storage (str): How keyframe images are held, see iter_keyframes.
+        jpeg_quality (int): JPEG quality for the "jpeg" and "disk" storages.
+        spill_dir (str): Directory for the "disk" storage.
 
-        # Motion detection
-        flow = cv2.calcOpticalFlowFarneback(prev_frame_gray, curr_frame_gray, None, 0.5, 3, 15, 3, 5, 1.2, 0)
-        mag, _ = cv2.cartToPolar(flow[..., 0], flow[..., 1])
-        mean_magnitude = mag.mean()
+    Yields:
+        tuple: (frame_index, frame_image, frame_hash) for every frame that could be decoded.
+    """
+    if storage not in KEYFRAME_STORAGES:
+        raise ValueError(f"Unknown keyframe storage '{storage}', expected one of {KEYFRAME_STORAGES}")
+    if storage == "disk" and spill_dir is None:
+        spill_dir = tempfile.mkdtemp(prefix="keyframes_")
 
-        # Histogram difference
-        hist_diff = cv2.compareHist(prev_hist, curr_hist, cv2.HISTCMP_CHISQR)
+    video = cv2.VideoCapture(video_path)
+    if not video.isOpened():
+        raise ValueError("Error reading the video file.")
+    try:
+        for frame_index, frame_hash in keyframes:
+            video.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+            success, frame_image = video.read()
+            if success:
+                yield frame_index, _store_frame(frame_index, frame_image, storage, jpeg_quality, spill_dir), frame_hash
+    finally:
+        video.release()
 
-        # Keyframe condition
-        if (mean_magnitude > motion_threshold or hist_diff > hist_threshold) and (curr_frame - last_keyframe) > min_scene_length * fps:
-            keyframes.append((curr_frame, curr_frame_img))
-            last_keyframe = curr_frame
 
-        prev_frame_gray = curr_frame_gray
-        prev_hist = curr_hist
+def detect_keyframes_parallel(video_path, motion_threshold=0.2, hist_threshold=50, min_scene_length=10, skip_frames=2,
+                              downsample_ratio=0.5, return_hashes=False, workers=None, detector=KEYFRAME_DETECTOR,
+                              storage="array", jpeg_quality=JPEG_QUALITY, spill_dir=None):
+    """
+    Detects keyframes by scanning time ranges of the video in parallel processes.
+
+    Each worker seeks to its range and reports every sampled frame that
+    passes the change test. The candidates are then merged in order and
+    filtered with min_scene_length exactly as the serial scan does, so gaps
+    across segment boundaries are honoured, and finally the accepted frames
+    are decoded by seeking to them.
 
+    Unlike the serial scan, which skips the change test while the last
+    keyframe is closer than min_scene_length, the segments cannot know
+    where earlier keyframes fall, so the detector runs on every sample.
+    With few workers this extra work can make the parallel path slower
+    than the serial one.
+
+    Workers are started with the spawn method even where fork is the
+    default, since the scan is usually requested from a multithreaded
+    server process that is unsafe to fork.
+
+    Tolerance: with frame-accurate seeking (the usual case for constant
+    frame rate files) the output equals the serial detect_keyframes. On
+    containers where OpenCV can only seek approximately, a segment's first
+    comparison and the returned images can be off by a few frames; frame
+    indices past the first sample of each segment are unaffected.
+
+    Args:
+        video_path (str): Path to the video file.
+        motion_threshold (float): Optical flow magnitude threshold to detect significant motion.
+        hist_threshold (float): Chi-square histogram distance threshold to detect a change of scene.
+        min_scene_length (int): Minimum time between consecutive keyframes in seconds.
+        skip_frames (int): Number of frames to skip for efficiency.
+        downsample_ratio (float): Factor by which to downsample frames for faster processing.
+        return_hashes (bool): Also return the dHash of each keyframe.
+        workers (int): Number of processes. Defaults to the number of CPUs.
+        detector (str): Name of the change detector in DETECTORS.
+        storage (str): How keyframe images are held, see iter_keyframes.
+        jpeg_quality (int): JPEG quality for the "jpeg" and "disk" storages.
+        spill_dir (str): Directory for the "disk" storage.
+
+    Returns:
+        list: Same as detect_keyframes.
+    """
+    if storage == "disk" and spill_dir is None:
+        spill_dir = tempfile.mkdtemp(prefix="keyframes_")
+    return list(_iter_keyframes_parallel(video_path, motion_threshold, hist_threshold, min_scene_length, skip_frames,
+                                         downsample_ratio, return_hashes, workers or os.cpu_count() or 1, detector,
+                                         storage, jpeg_quality, spill_dir))
+
+
+def _iter_keyframes_parallel(video_path, motion_threshold, hist_threshold, min_scene_length, skip_frames, downsample_ratio,
+                             return_hashes, workers, detector, storage, jpeg_quality, spill_dir):
+    _get_detector(detector)
+    video = cv2.VideoCapture(video_path)
+    if not video.isOpened():
+        raise ValueError("Error reading the video file.")
+    fps = video.get(cv2.CAP_PROP_FPS)
+    frame_count = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
     video.release()
-    return keyframes
 
+    # Segments start on the serial sampling grid; the last one runs to the real end of the stream
+    segment_length = max(math.ceil(frame_count / workers / skip_frames) * skip_frames, skip_frames)
+    starts = list(range(0, max(frame_count, 1), segment_length))
+    bounds = [(start, starts[i + 1] if i + 1 < len(starts) else None) for i, start in enumerate(starts)]
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(bounds)),
+                             mp_context=multiprocessing.get_context("spawn")) as executor:
+        scans = [
+            executor.submit(_scan_segment, video_path, start, end, motion_threshold, hist_threshold, skip_frames,
+                            downsample_ratio, detector)
+            for start, end in bounds
+        ]
+        candidates = []
+        for scan in scans:
+            segment_candidates, frames_processed = scan.result()
+            candidates.extend(segment_candidates)
+            increment("keyframe_frames_processed_total", frames_processed)
+
+        # Stitch: apply the minimum scene length across the merged candidates
+        accepted = []
+        last_keyframe = -min_scene_length * fps
+        for frame_index, frame_hash in candidates:
+            if (frame_index - last_keyframe) > min_scene_length * fps:
+                accepted.append((frame_index, frame_hash))
+                last_keyframe = frame_index
+        increment("keyframes_detected_total", len(accepted))
+
+        # Decode accepted frames in small ordered batches, with a bounded number in flight
+        hashes = dict(accepted)
+        indices = [frame_index for frame_index, _ in accepted]
 
+        def emit(frames):
+            for frame_index, frame_image in frames:
+                if storage == "disk":
+                    path = os.path.join(spill_dir, f"keyframe_{frame_index}.jpg")
+                    with open(path, "wb") as f:
+                        f.write(frame_image.to_jpeg())
+                    frame_image = SpilledFrame(path)
+                if return_hashes:
+                    yield frame_index, frame_image, hashes[frame_index]
+                else:
+                    yield frame_index, frame_image
 
+        pending = deque()
+        for i in range(0, len(indices), READ_BATCH_SIZE):
+            pending.append(executor.submit(_read_frames, video_path, indices[i:i + READ_BATCH_SIZE],
+                                           storage != "array", jpeg_quality))
+            if len(pending) >= workers * 2:
+                yield from emit(pending.popleft().result())
+        while pending:
+            yield from emit(pending.popleft().result())
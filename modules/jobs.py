@@ -0,0 +1,225 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from modules.metrics import increment
+from modules.pipeline import PIPELINE_STAGES, run_pipeline
+from modules.presentation import PRESENTATION_DIR
+
+# Worker pool sizing; uploads beyond MAX_PENDING_JOBS are rejected instead of queued
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+MAX_PENDING_JOBS = int(os.getenv("MAX_PENDING_JOBS", "32"))
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+# Idle event streams send a comment this often so proxies keep the connection open
+EVENT_HEARTBEAT_SECONDS = float(os.getenv("EVENT_HEARTBEAT_SECONDS", "15"))
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="pipeline")
+_jobs = {}
+_jobs_lock = threading.Lock()
+# Notified whenever a job changes, so event streams wake up instead of polling
+_jobs_changed = threading.Condition(_jobs_lock)
+
+
+class JobQueueFull(RuntimeError):
+    """Raised when the pipeline already has MAX_PENDING_JOBS jobs waiting or running."""
+
+
+def _prune_finished_jobs():
+    """Forgets finished jobs older than the retention window and deletes their decks. Caller holds the jobs lock."""
+    now = time.time()
+    for job_id, job in list(_jobs.items()):
+        if job["finished_at"] and now - job["finished_at"] > JOB_RETENTION_SECONDS:
+            del _jobs[job_id]
+            # Every job writes a deck of its own, so it goes with the job or PRESENTATION_DIR grows forever
+            ppt_url = (job["result"] or {}).get("ppt_url")
+            if ppt_url:
+                try:
+                    os.remove(os.path.join(PRESENTATION_DIR, os.path.basename(ppt_url)))
+                except OSError:
+                    pass
+
+
+def _touch(job):
+    """Marks a job as changed and wakes its event streams. Caller holds the jobs lock."""
+    job["version"] += 1
+    _jobs_changed.notify_all()
+
+
+def _remove_video(video_path):
+    try:
+        os.remove(video_path)
+    except OSError as e:
+        print(f"Could not delete {video_path}: {e}")
+
+
+def _run_job(job_id, video_path, api_key, options, delete_video):
+    def progress(stage, status):
+        with _jobs_lock:
+            entry = _jobs[job_id]["stages"][stage]
+            entry["status"] = status
+            entry["started_at" if status == "running" else "finished_at"] = time.time()
+            _touch(_jobs[job_id])
+
+    def transcript_chunk(chunk):
+        with _jobs_lock:
+            _jobs[job_id]["partial_transcript"].append(chunk["text"])
+            _touch(_jobs[job_id])
+
+    def summary_token(text):
+        with _jobs_lock:
+            _jobs[job_id]["summary_tokens"].append(text)
+            _touch(_jobs[job_id])
+
+    with _jobs_lock:
+        _jobs[job_id]["status"] = "running"
+        _jobs[job_id]["started_at"] = time.time()
+        _touch(_jobs[job_id])
+
+    try:
+        result = run_pipeline(video_path, api_key, progress=progress, on_transcript_chunk=transcript_chunk,
+                              on_summary_token=summary_token, **options)
+    except Exception as e:
+        print(f"Job {job_id} failed: {e}")
+        increment("jobs_total", status="failed")
+        with _jobs_lock:
+            _jobs[job_id].update(status="failed", error=str(e), finished_at=time.time())
+            _touch(_jobs[job_id])
+        return
+    finally:
+        # Uploads are stored one file per request, so they go once the job no longer needs them
+        if delete_video:
+            _remove_video(video_path)
+
+    increment("jobs_total", status="completed")
+    with _jobs_lock:
+        _jobs[job_id].update(status="completed", result=result, finished_at=time.time())
+        _touch(_jobs[job_id])
+
+
+def submit_job(video_path, api_key, delete_video=False, **options):
+    """
+    Queues a video for processing on the pipeline worker pool.
+
+    Args:
+        video_path (str): Path to the uploaded video file.
+        api_key (str): Groq API key for authentication.
+        delete_video (bool): Whether to delete the video file once the job has finished, successfully or not.
+        **options: Extra keyword arguments forwarded to run_pipeline.
+
+    Returns:
+        str: The id of the queued job.
+    """
+    job_id = uuid.uuid4().hex
+    with _jobs_lock:
+        _prune_finished_jobs()
+        pending = sum(1 for job in _jobs.values() if job["status"] in ("queued", "running"))
+        if pending >= MAX_PENDING_JOBS:
+            raise JobQueueFull(f"{pending} jobs already pending")
+        _jobs[job_id] = {
+            "id": job_id,
+            "status": "queued",
+            "stages": {stage: {"status": "pending", "started_at": None, "finished_at": None} for stage in PIPELINE_STAGES},
+            "partial_transcript": [],
+            "summary_tokens": [],
+            "result": None,
+            "error": None,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "version": 0,
+        }
+        _jobs[job_id]["future"] = _executor.submit(_run_job, job_id, video_path, api_key, options, delete_video)
+    return job_id
+
+
+def get_job(job_id):
+    """
+    Returns a snapshot of a job's status, per-stage progress, transcript so far and result.
+
+    Args:
+        job_id (str): Id returned by submit_job.
+
+    Returns:
+        dict: The job snapshot, or None if the job is unknown.
+    """
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return None
+        snapshot = {key: value for key, value in job.items() if key not in ("future", "summary_tokens", "version")}
+        snapshot["stages"] = {stage: dict(entry) for stage, entry in job["stages"].items()}
+        snapshot["partial_transcript"] = " ".join(job["partial_transcript"])
+        done = sum(1 for entry in job["stages"].values() if entry["status"] in ("done", "cached"))
+        snapshot["progress"] = done / len(job["stages"])
+        return snapshot
+
+
+def wait_for_job(job_id, timeout=None):
+    """
+    Blocks until a job finishes and returns its snapshot.
+
+    Args:
+        job_id (str): Id returned by submit_job.
+        timeout (float): Maximum number of seconds to wait.
+
+    Returns:
+        dict: The job snapshot, or None if the job is unknown.
+    """
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+    if job is None:
+        return None
+    job["future"].result(timeout=timeout)
+    return get_job(job_id)
+
+
+def iter_job_events(job_id, heartbeat=EVENT_HEARTBEAT_SECONDS):
+    """
+    Yields a job's progress as events until it finishes, for server-sent events.
+
+    A client connecting late first receives the stage states and the summary
+    text generated so far, then only what changes. Events are collected under
+    the jobs lock and yielded outside it, so a slow client never blocks the
+    pipeline.
+
+    Args:
+        job_id (str): Id returned by submit_job.
+        heartbeat (float): Seconds without changes after which a "ping" event is yielded.
+
+    Yields:
+        tuple: (event name, data dict). Names are "stage", "token", "ping" and
+        finally "done" with the summary and presentation URL, or "error".
+    """
+    stages = {}
+    tokens_sent = 0
+    version = -1
+    while True:
+        events = []
+        with _jobs_lock:
+            job = _jobs.get(job_id)
+            if job is None:
+                yield "error", {"error": "Unknown job"}
+                return
+            if job["version"] == version:
+                _jobs_changed.wait_for(lambda: job["version"] != version, timeout=heartbeat)
+            if job["version"] == version:
+                events.append(("ping", {}))
+            version = job["version"]
+            for stage, entry in job["stages"].items():
+                if stages.get(stage) != entry["status"]:
+                    stages[stage] = entry["status"]
+                    events.append(("stage", {"stage": stage, "status": entry["status"]}))
+            if len(job["summary_tokens"]) > tokens_sent:
+                events.append(("token", {"text": "".join(job["summary_tokens"][tokens_sent:])}))
+                tokens_sent = len(job["summary_tokens"])
+            status, result, error = job["status"], job["result"], job["error"]
+
+        yield from events
+        if status == "completed":
+            yield "done", {"summary": result["summary"], "ppt_url": result["ppt_url"]}
+            return
+        if status == "failed":
+            yield "error", {"error": error}
+            return
@@ -0,0 +1,163 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets in seconds, from a single fast API call up to a long transcription
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+# Metric name -> (type, help text)
+METRICS = {
+    "pipeline_stage_seconds": ("histogram", "Wall time of each pipeline stage."),
+    "api_request_seconds": ("histogram", "Latency of individual Groq API requests."),
+    "api_requests_total": ("counter", "Groq API requests by API and outcome."),
+    "api_request_bytes_total": ("counter", "Request payload bytes sent to the Groq API."),
+    "keyframe_frames_processed_total": ("counter", "Sampled video frames run through keyframe detection."),
+    "keyframes_detected_total": ("counter", "Keyframes emitted by keyframe detection."),
+    "audio_seconds_transcribed_total": ("counter", "Seconds of audio transcribed."),
+    "jobs_total": ("counter", "Pipeline jobs by final status."),
+}
+
+_lock = threading.Lock()
+_counters = {}    # (name, labels) -> value
+_histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def increment(name, amount=1, **labels):
+    """
+    Adds amount to a counter.
+
+    Args:
+        name (str): Metric name from METRICS.
+        amount (float): Value to add.
+        **labels: Label values, e.g. api="caption".
+    """
+    key = (name, _label_key(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def observe(name, value, **labels):
+    """
+    Records a value in a histogram.
+
+    Args:
+        name (str): Metric name from METRICS.
+        value (float): Observed value, in seconds for latency histograms.
+        **labels: Label values, e.g. stage="transcription".
+    """
+    key = (name, _label_key(labels))
+    with _lock:
+        entry = _histograms.get(key)
+        if entry is None:
+            entry = _histograms[key] = [0] * len(DEFAULT_BUCKETS) + [0.0, 0]
+        for i, bound in enumerate(DEFAULT_BUCKETS):
+            if value <= bound:
+                entry[i] += 1
+        entry[-2] += value
+        entry[-1] += 1
+
+
+@contextmanager
+def span(stage, histogram="pipeline_stage_seconds", exclude=None, **labels):
+    """
+    Times the enclosed block and records it in a latency histogram.
+
+    Args:
+        stage (str): Value of the "stage" label.
+        histogram (str): Histogram the duration is recorded in.
+        exclude (dict): Optional dict whose "seconds" are subtracted from the duration, e.g. filled by waiting_iter.
+        **labels: Extra label values.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if exclude is not None:
+            elapsed = max(elapsed - exclude["seconds"], 0.0)
+        observe(histogram, elapsed, stage=stage, **labels)
+
+
+def waiting_iter(iterable, waited):
+    """
+    Yields from iterable, adding the time spent waiting for each item to waited["seconds"].
+
+    Passed as span(exclude=waited), this keeps a consumer's span from also
+    counting the time its lazy input spent producing items, which that
+    input's own stage already measures.
+    """
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            waited["seconds"] += time.perf_counter() - start
+        yield item
+
+
+def timed_iter(iterable, stage):
+    """
+    Yields from iterable, recording only the time spent producing items under stage.
+
+    Time the consumer spends between items is not counted, so a generator
+    that is consumed concurrently with other work is still measured fairly.
+    """
+    iterator = iter(iterable)
+    elapsed = 0.0
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                elapsed += time.perf_counter() - start
+            yield item
+    finally:
+        observe("pipeline_stage_seconds", elapsed, stage=stage)
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{name}="{str(value)}"' for name, value in items) + "}"
+
+
+def render_prometheus():
+    """
+    Renders every metric in the Prometheus text exposition format.
+
+    Returns:
+        str: The metrics page served at /metrics.
+    """
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: list(entry) for key, entry in _histograms.items()}
+
+    lines = []
+    for name, (metric_type, help_text) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        if metric_type == "counter":
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+        else:
+            for (metric, labels), entry in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                for bound, count in zip(DEFAULT_BUCKETS, entry):
+                    lines.append(f"{name}_bucket{_format_labels(labels, ('le', bound))} {count}")
+                lines.append(f"{name}_bucket{_format_labels(labels, ('le', '+Inf'))} {entry[-1]}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {entry[-2]}")
+                lines.append(f"{name}_count{_format_labels(labels)} {entry[-1]}")
+    return "\n".join(lines) + "\n"
@@ -1,26 +1,240 @@
 import whisper
+import copy
 import os
+import queue
+import subprocess
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from modules.metrics import increment, span
+import numpy as np
 from transformers import BlipProcessor, BlipForConditionalGeneration
 import torch
 
 
-def load_whisper_model(model_size="base"):
+# Opt-in int8 dynamic quantization of Whisper's linear layers for CPU-only hosts
+WHISPER_QUANTIZE = os.getenv("WHISPER_QUANTIZE", "0").lower() in ("1", "true", "yes")
+
+
+def quantize_linear_layers(model):
+    """
+    Applies PyTorch dynamic int8 quantization to every linear layer of a model.
+
+    Weights are stored as int8 and activations are quantized on the fly, which
+    roughly quarters the memory of the linear weights and speeds up CPU
+    inference. Subclasses of nn.Linear (Whisper defines its own to cast weights
+    to the input dtype) are turned back into plain nn.Linear first, because
+    quantize_dynamic only replaces modules whose type matches exactly.
+
+    Args:
+        model (torch.nn.Module): Model on the CPU, in eval mode.
+
+    Returns:
+        torch.nn.Module: The quantized model, CPU only.
+    """
+    for module in model.modules():
+        if isinstance(module, torch.nn.Linear) and type(module) is not torch.nn.Linear:
+            module.__class__ = torch.nn.Linear
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def load_whisper_model(model_size="base", quantize=False):
     """
     Loads the Whisper model for audio transcription.
 
     Args:
         model_size (str): The size of the Whisper model to load (e.g., "tiny", "base", "small", "medium", "large").
+        quantize (bool): Whether to load an int8 dynamically quantized model; quantized models run on the CPU.
 
     Returns:
         model: The loaded Whisper model.
     """
-    print(f"Loading Whisper model: {model_size}")
-    device = "cuda" if torch.cuda.is_available() else "cpu" 
+    print(f"Loading Whisper model: {model_size}{' (int8)' if quantize else ''}")
+    device = "cuda" if torch.cuda.is_available() and not quantize else "cpu" 
     model = whisper.load_model(model_size,device=device)
+    if quantize:
+        model = quantize_linear_layers(model.eval())
     return model
 
+
+# Process-wide registry of loaded Whisper models, ordered from least to most
+# recently used. Budgets can be tuned through the environment.
+MAX_WHISPER_MODELS = int(os.getenv("WHISPER_MAX_MODELS", "2"))
+MAX_WHISPER_BYTES = int(os.getenv("WHISPER_MAX_BYTES", "0"))  # 0 means no byte budget
+# Models not requested for this long are dropped by the idle reaper; 0 keeps them until the budget evicts them
+WHISPER_IDLE_SECONDS = float(os.getenv("WHISPER_IDLE_SECONDS", "1800"))
+
+_whisper_models = OrderedDict()  # (model_size, quantize) -> {"model", "bytes", "last_used"}
+_whisper_registry_lock = threading.Lock()
+_whisper_load_locks = {}
+_whisper_inference_locks = weakref.WeakKeyDictionary()
+_whisper_replica_cache = weakref.WeakKeyDictionary()
+_idle_reaper = None
+
+
+def _model_nbytes(model):
+    """Approximates the memory held by a model's parameters and buffers, int8 packed weights included."""
+    tensors = list(model.parameters()) + list(model.buffers())
+    for module in model.modules():
+        # Dynamically quantized linear layers keep their weights in packed params instead of parameters
+        if isinstance(getattr(module, "_packed_params", None), torch.nn.Module):
+            weight, bias = module._packed_params._weight_bias()
+            tensors += [weight] + ([bias] if bias is not None else [])
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+def _enforce_whisper_budget(keep=None):
+    """Evicts least recently used models until the registry fits its budget. Caller holds the registry lock."""
+    def over_budget():
+        if MAX_WHISPER_MODELS and len(_whisper_models) > MAX_WHISPER_MODELS:
+            return True
+        total = sum(entry["bytes"] for entry in _whisper_models.values())
+        return bool(MAX_WHISPER_BYTES) and total > MAX_WHISPER_BYTES
+
+    for key in list(_whisper_models):
+        if not over_budget():
+            break
+        if key == keep:
+            continue
+        del _whisper_models[key]
+        print(f"Evicted Whisper model: {key}")
+
+
+def get_whisper_model(model_size="base", quantize=WHISPER_QUANTIZE):
+    """
+    Returns a shared Whisper model, loading it at most once per process.
+
+    Concurrent callers asking for a size that is still loading wait for the
+    first load instead of deserializing the checkpoint again. Models beyond
+    the registry budget are evicted least recently used first; callers that
+    still hold a reference keep using their copy until they drop it.
+
+    Args:
+        model_size (str): The size of the Whisper model to load (e.g., "tiny", "base", "small", "medium", "large").
+        quantize (bool): Whether to use the int8 quantized variant, cached separately from the full precision one.
+
+    Returns:
+        model: The shared Whisper model.
+    """
+    key = (model_size, bool(quantize))
+    with _whisper_registry_lock:
+        entry = _whisper_models.get(key)
+        if entry is not None:
+            entry["last_used"] = time.monotonic()
+            _whisper_models.move_to_end(key)
+            return entry["model"]
+        load_lock = _whisper_load_locks.setdefault(key, threading.Lock())
+
+    with load_lock:
+        with _whisper_registry_lock:
+            entry = _whisper_models.get(key)
+            if entry is not None:
+                entry["last_used"] = time.monotonic()
+                _whisper_models.move_to_end(key)
+                return entry["model"]
+
+        model = load_whisper_model(model_size, quantize=quantize)
+
+        with _whisper_registry_lock:
+            _whisper_models[key] = {
+                "model": model,
+                "bytes": _model_nbytes(model),
+                "last_used": time.monotonic(),
+            }
+            _enforce_whisper_budget(keep=key)
+        return model
+
+
+def preload_whisper_models(model_sizes, quantize=WHISPER_QUANTIZE):
+    """
+    Loads Whisper models into the registry ahead of the first request.
+
+    Args:
+        model_sizes (list): Model sizes to load, e.g. ["base"].
+        quantize (bool): Whether to load the int8 quantized variants.
+    """
+    for model_size in model_sizes:
+        get_whisper_model(model_size, quantize=quantize)
+
+
+def evict_idle_whisper_models(max_idle_seconds):
+    """
+    Drops models that have not been requested for a while.
+
+    Args:
+        max_idle_seconds (float): Idle time after which a model is evicted.
+
+    Returns:
+        list: The (model size, quantized) keys that were evicted.
+    """
+    now = time.monotonic()
+    evicted = []
+    with _whisper_registry_lock:
+        for key, entry in list(_whisper_models.items()):
+            if now - entry["last_used"] > max_idle_seconds:
+                del _whisper_models[key]
+                evicted.append(key)
+    for key in evicted:
+        print(f"Evicted idle Whisper model: {key}")
+    return evicted
+
+
+def start_idle_eviction(max_idle_seconds=WHISPER_IDLE_SECONDS):
+    """
+    Starts a daemon thread that runs evict_idle_whisper_models periodically, at most once per process.
+
+    Args:
+        max_idle_seconds (float): Idle time after which a model is evicted; 0 disables the reaper.
+
+    Returns:
+        threading.Thread: The reaper thread, or None if it is disabled.
+    """
+    global _idle_reaper
+    if not max_idle_seconds:
+        return None
+    with _whisper_registry_lock:
+        if _idle_reaper is None:
+            def reap():
+                # Checking a few times per idle window keeps models from lingering much past it
+                while True:
+                    time.sleep(max(max_idle_seconds / 4, 1))
+                    evict_idle_whisper_models(max_idle_seconds)
+
+            _idle_reaper = threading.Thread(target=reap, daemon=True, name="whisper-idle-reaper")
+            _idle_reaper.start()
+        return _idle_reaper
+
+
+def whisper_inference_lock(model):
+    """
+    Returns the lock that serializes inference on a shared Whisper model.
+
+    Whisper installs key/value cache hooks on the model for the duration of a
+    decode, so two threads decoding on the same instance would corrupt each
+    other's caches.
+    """
+    with _whisper_registry_lock:
+        lock = _whisper_inference_locks.get(model)
+        if lock is None:
+            lock = threading.Lock()
+            _whisper_inference_locks[model] = lock
+        return lock
+
 from moviepy import VideoFileClip
 
+AUDIO_SAMPLE_RATE = whisper.audio.SAMPLE_RATE
+
+# Long-audio mode: chunks transcribed in parallel and their target length in seconds
+TRANSCRIBE_WORKERS = int(os.getenv("TRANSCRIBE_WORKERS", "1"))
+TRANSCRIBE_CHUNK_SECONDS = float(os.getenv("TRANSCRIBE_CHUNK_SECONDS", "120"))
+
+# Windows installs keep ffmpeg outside the default PATH
+FFMPEG_DIR = r"C:\ffmpeg\ffmpeg-master-latest-win64-gpl-shared\bin"
+if FFMPEG_DIR not in os.environ["PATH"].split(os.pathsep):
+    os.environ["PATH"] += os.pathsep + FFMPEG_DIR
+
 def extract_audio_from_video(video_path, audio_output_path="temp_audio.wav"):
     """
     Extracts audio from a video file and saves it as a WAV file.
@@ -38,23 +252,168 @@ def extract_audio_from_video(video_path, audio_output_path="temp_audio.wav"):
     return audio_output_path
 
 
-def transcribe_audio(video_path, model):
+def decode_audio(video_path, sample_rate=AUDIO_SAMPLE_RATE):
+    """
+    Decodes the soundtrack of a video straight into memory through an ffmpeg pipe.
+
+    Args:
+        video_path (str): Path to the input video file.
+        sample_rate (int): Sample rate to resample to; Whisper expects 16 kHz.
+
+    Returns:
+        ndarray: Mono float32 samples in [-1, 1].
+    """
+    cmd = [
+        "ffmpeg", "-nostdin", "-threads", "0",
+        "-i", video_path,
+        "-vn", "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sample_rate),
+        "-",
+    ]
+    try:
+        with span("audio_decode"):
+            out = subprocess.run(cmd, capture_output=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Failed to decode audio: {e.stderr.decode(errors='replace')}") from e
+    return np.frombuffer(out, np.int16).astype(np.float32) / 32768.0
+
+
+def split_on_silence(audio, sample_rate=AUDIO_SAMPLE_RATE, chunk_seconds=None, window_seconds=0.5):
+    """
+    Splits audio into chunks of roughly chunk_seconds, cutting at the quietest point near each target length.
+
+    Energy is measured on 20 ms frames and smoothed over window_seconds, and
+    each cut is placed at the energy minimum within a quarter chunk of the
+    target, so cuts fall in pauses between sentences whenever there are any.
+
+    Args:
+        audio (ndarray): Mono float32 samples.
+        sample_rate (int): Sample rate of audio.
+        chunk_seconds (float): Target chunk length. Defaults to TRANSCRIBE_CHUNK_SECONDS.
+        window_seconds (float): Length of the pause a cut should fall into.
+
+    Returns:
+        list: Tuples (start_sample, end_sample) covering the whole audio in order.
+    """
+    chunk = int((chunk_seconds or TRANSCRIBE_CHUNK_SECONDS) * sample_rate)
+    search = chunk // 4
+    total = len(audio)
+    if total <= chunk + search:
+        return [(0, total)]
+
+    hop = int(0.02 * sample_rate)
+    frames = total // hop
+    energy = np.square(audio[:frames * hop].reshape(frames, hop)).mean(axis=1)
+    window = max(1, int(window_seconds * sample_rate / hop))
+    smoothed = np.convolve(energy, np.ones(window) / window, mode="same")
+
+    bounds = []
+    start = 0
+    while total - start > chunk + search:
+        low = (start + chunk - search) // hop
+        high = (start + chunk + search) // hop
+        cut = (low + int(np.argmin(smoothed[low:high]))) * hop
+        bounds.append((start, cut))
+        start = cut
+    bounds.append((start, total))
+    return bounds
+
+
+def _whisper_replicas(model, count):
+    """
+    Returns count models that share model's weights but each have their own modules.
+
+    Whisper installs decoding hooks on its modules, so parallel decodes need
+    separate module objects; deep-copying with every parameter and buffer
+    pre-seeded in the memo shares the tensors instead of duplicating them.
+    """
+    with _whisper_registry_lock:
+        replicas = _whisper_replica_cache.setdefault(model, [])
+        while len(replicas) < count - 1:
+            memo = {id(tensor): tensor for tensor in list(model.parameters()) + list(model.buffers())}
+            # Quantized linear layers hold their int8 weights in a packed-params module, shared the same way
+            memo.update({id(module._packed_params): module._packed_params for module in model.modules()
+                         if isinstance(getattr(module, "_packed_params", None), torch.nn.Module)})
+            replicas.append(copy.deepcopy(model, memo))
+        return [model] + replicas[:count - 1]
+
+
+def iter_transcription(audio, model, workers=TRANSCRIBE_WORKERS, chunk_seconds=None, sample_rate=AUDIO_SAMPLE_RATE):
+    """
+    Transcribes long audio in silence-delimited chunks across a pool of workers sharing the Whisper weights.
+
+    Chunks are yielded in order as soon as they and every earlier chunk are
+    done, so callers can consume a partial transcript while later chunks are
+    still being decoded.
+
+    Args:
+        audio (ndarray): Mono float32 samples at sample_rate.
+        model: Preloaded Whisper model.
+        workers (int): Number of chunks decoded at the same time.
+        chunk_seconds (float): Target chunk length. Defaults to TRANSCRIBE_CHUNK_SECONDS.
+        sample_rate (int): Sample rate of audio.
+
+    Yields:
+        dict: "start" and "end" in seconds, "text", and Whisper "segments" with timestamps relative to the whole audio.
+    """
+    bounds = split_on_silence(audio, sample_rate, chunk_seconds)
+    replicas = queue.Queue()
+    for replica in _whisper_replicas(model, min(workers, len(bounds))):
+        replicas.put(replica)
+
+    def transcribe_chunk(start, end):
+        replica = replicas.get()
+        try:
+            with whisper_inference_lock(replica), span("transcription_chunk"):
+                result = replica.transcribe(audio[start:end])
+        finally:
+            replicas.put(replica)
+        offset = start / sample_rate
+        segments = [dict(segment, start=segment["start"] + offset, end=segment["end"] + offset)
+                    for segment in result["segments"]]
+        return {"start": offset, "end": end / sample_rate, "text": result["text"].strip(), "segments": segments}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(bounds))), thread_name_prefix="whisper") as executor:
+        futures = [executor.submit(transcribe_chunk, start, end) for start, end in bounds]
+        for future in futures:
+            yield future.result()
+
+
+def transcribe_audio(video_path, model, workers=TRANSCRIBE_WORKERS, chunk_seconds=None, on_chunk=None):
     """
     Transcribes audio using a Whisper model.
 
+    The audio is decoded into a NumPy buffer instead of a temporary WAV
+    file, so concurrent calls never share files on disk. With workers > 1,
+    recordings longer than two chunks are split at silences and transcribed
+    in parallel (see iter_transcription).
+
     Args:
-        audio_path (str): Path to the audio file to transcribe.
+        video_path (str): Path to the video file whose audio is transcribed.
         model: Preloaded Whisper model.
+        workers (int): Number of chunks transcribed in parallel for long recordings.
+        chunk_seconds (float): Target chunk length. Defaults to TRANSCRIBE_CHUNK_SECONDS.
+        on_chunk (callable): Optional callback receiving each chunk dict (see iter_transcription) in order as it completes.
 
     Returns:
         str: Transcribed text.
     """
-    os.environ["PATH"] += os.pathsep + r"C:\ffmpeg\ffmpeg-master-latest-win64-gpl-shared\bin"
-    video_clip = VideoFileClip(video_path)
-    audio_path = "temp_audio.wav"
-    video_clip.audio.write_audiofile(audio_path)
+    audio = decode_audio(video_path)
+    increment("audio_seconds_transcribed_total", len(audio) / AUDIO_SAMPLE_RATE)
+
+    if workers > 1 and len(audio) > 2 * (chunk_seconds or TRANSCRIBE_CHUNK_SECONDS) * AUDIO_SAMPLE_RATE:
+        texts = []
+        for chunk in iter_transcription(audio, model, workers, chunk_seconds):
+            print(f"Transcribed audio {chunk['start']:.0f}s-{chunk['end']:.0f}s")
+            texts.append(chunk["text"])
+            if on_chunk is not None:
+                on_chunk(chunk)
+        return " ".join(texts)
 
-    result = model.transcribe(audio_path)
+    with whisper_inference_lock(model):
+        result = model.transcribe(audio)
+    if on_chunk is not None:
+        on_chunk({"start": 0.0, "end": len(audio) / AUDIO_SAMPLE_RATE, "text": result["text"].strip(),
+                  "segments": result["segments"]})
     return result["text"]
 
 
@@ -0,0 +1,119 @@
+import hashlib
+import io
+import multiprocessing
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import pytesseract
+from PIL import Image
+
+# Noise lines dropped from OCR output, compiled once instead of on every line
+ID_NUMBER_PATTERN = re.compile(r"^\d{5,}$")
+CONTACT_PATTERN = re.compile(r"@|\.com|www", re.IGNORECASE)
+PAGE_NUMBER_PATTERN = re.compile(r"^Page\s\d+", re.IGNORECASE)
+SHORT_NUMBER_PATTERN = re.compile(r"\d{2,4}")
+
+# Batch OCR runs Tesseract in OCR_WORKERS processes; results are cached by image hash
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(os.cpu_count() or 1)))
+OCR_CACHE_SIZE = int(os.getenv("OCR_CACHE_SIZE", "256"))
+
+_ocr_executor = None
+_ocr_cache = OrderedDict()
+_ocr_lock = threading.Lock()
+
+
+def clean_ocr_text(ocr_text):
+    """Drops empty lines, long ID numbers, contact details, page numbers and short numeric fragments."""
+    cleaned_lines = []
+    for line in ocr_text.split("\n"):
+        line = line.strip()
+        if not line:
+            continue
+        if ID_NUMBER_PATTERN.match(line):
+            continue
+        if CONTACT_PATTERN.search(line):
+            continue
+        if PAGE_NUMBER_PATTERN.match(line):
+            continue
+        if len(line.split()) <= 2 and SHORT_NUMBER_PATTERN.search(line):
+            continue
+        cleaned_lines.append(line)
+    return "\n".join(cleaned_lines)
+
+
+def preprocess_page(image, max_width=None, binarize=False, threshold=160):
+    """
+    Prepares a scanned page for Tesseract.
+
+    Args:
+        image (PIL.Image): The scanned page.
+        max_width (int): Pages wider than this are downscaled, keeping the aspect ratio.
+        binarize (bool): Whether to convert the page to pure black and white.
+        threshold (int): Gray level above which a pixel becomes white when binarizing.
+
+    Returns:
+        PIL.Image: The preprocessed page.
+    """
+    image = image.convert("L")
+    if max_width and image.width > max_width:
+        image = image.resize((max_width, round(image.height * max_width / image.width)), Image.LANCZOS)
+    if binarize:
+        image = image.point(lambda value: 255 if value > threshold else 0, mode="1")
+    return image
+
+
+def ocr_page(image_bytes, max_width=None, binarize=False, tesseract_cmd=None):
+    """Runs Tesseract on one encoded image in a worker process and returns the cleaned text."""
+    if tesseract_cmd:
+        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    image = preprocess_page(Image.open(io.BytesIO(image_bytes)), max_width, binarize)
+    return clean_ocr_text(pytesseract.image_to_string(image))
+
+
+def _get_ocr_executor():
+    global _ocr_executor
+    with _ocr_lock:
+        if _ocr_executor is None:
+            # Workers start from a fresh interpreter instead of forking the multithreaded server that submits to them
+            _ocr_executor = ProcessPoolExecutor(max_workers=OCR_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _ocr_executor
+
+
+def ocr_pages(images, max_width=None, binarize=False):
+    """
+    OCRs many encoded images across the process pool, reusing cached results.
+
+    Args:
+        images (list): Encoded image bytes, one per page.
+        max_width (int): Pages wider than this are downscaled first.
+        binarize (bool): Whether pages are binarized first.
+
+    Returns:
+        list: (cleaned text, whether it came from the cache) per page, in order.
+    """
+    # Preprocessing changes the output, so it is part of the cache key
+    keys = [(hashlib.sha256(data).hexdigest(), max_width, binarize) for data in images]
+    results = {}
+    with _ocr_lock:
+        for key in keys:
+            if key in _ocr_cache:
+                _ocr_cache.move_to_end(key)
+                results[key] = (_ocr_cache[key], True)
+
+    executor = _get_ocr_executor()
+    futures = {}
+    for key, data in zip(keys, images):
+        if key not in results and key not in futures:
+            # The parent's Tesseract path is passed along since spawned workers do not inherit it
+            futures[key] = executor.submit(ocr_page, data, max_width, binarize, pytesseract.pytesseract.tesseract_cmd)
+    for key, future in futures.items():
+        text = future.result()
+        results[key] = (text, False)
+        with _ocr_lock:
+            _ocr_cache[key] = text
+            while len(_ocr_cache) > OCR_CACHE_SIZE:
+                _ocr_cache.popitem(last=False)
+    return [results[key] for key in keys]
@@ -0,0 +1,209 @@
+import inspect
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from modules.cache import StageCache, hash_file, stage_key
+from modules.metrics import span, timed_iter, waiting_iter
+from modules.data_processing import (
+    DEDUP_DISTANCE, iter_keyframes, iter_unique_keyframes, read_keyframes, video_frame_count,
+)
+from modules.models import TRANSCRIBE_WORKERS, WHISPER_QUANTIZE, get_whisper_model, transcribe_audio
+from modules.presentation import generate_presentation
+from modules.summarization import (
+    CAPTION_ERROR, CAPTION_MODEL, CAPTION_PROMPT, CAPTION_WORKERS, PART_SUMMARY_PROMPT, SUMMARY_ERROR, SUMMARY_MODEL,
+    SUMMARY_PROMPT, build_summary_input, caption_cache_params, get_keyframe_descriptions, summarize_video,
+)
+
+# Order in which the stages of the video pipeline run
+PIPELINE_STAGES = ["keyframes", "captions", "transcription", "summary", "presentation"]
+
+# Parameters that change how a stage runs but not what it produces, left out of cache keys
+EXECUTION_PARAMS = {"workers", "spill_dir"}
+
+
+def _report(progress, stage, status):
+    if progress is not None:
+        progress(stage, status)
+
+
+def _bound_params(func, overrides):
+    """Returns the keyword arguments func will run with, defaults included, so they can be part of a cache key."""
+    params = {
+        name: parameter.default
+        for name, parameter in inspect.signature(func).parameters.items()
+        if parameter.default is not inspect.Parameter.empty
+    }
+    params.update(overrides or {})
+    return params
+
+
+def _timed(timings, name, func, *args):
+    """Calls func(*args) and records its wall time in seconds under timings[name]."""
+    start = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        timings[name] = time.perf_counter() - start
+
+
+def _collect_keyframes(keyframes, cache, key, progress):
+    """
+    Passes keyframes through while recording their frame indices and hashes, then caches those once detection finishes.
+
+    Only the small (frame_index, frame_hash) pairs are kept, so memory does
+    not grow with the number of keyframes; a cache hit decodes the images
+    again with read_keyframes.
+    """
+    collected = []
+    for frame_index, frame_image, frame_hash in keyframes:
+        collected.append((frame_index, frame_hash))
+        yield frame_index, frame_image, frame_hash
+    cache.put(key, collected)
+    _report(progress, "keyframes", "done")
+
+
+def run_pipeline(video_path, api_key, whisper_model_size="base", keyframe_params=None, dedup_distance=DEDUP_DISTANCE,
+                 video_hash=None, use_cache=True, cache=None, progress=None, on_transcript_chunk=None,
+                 on_summary_token=None, caption_workers=CAPTION_WORKERS, transcribe_workers=TRANSCRIBE_WORKERS,
+                 whisper_quantize=WHISPER_QUANTIZE):
+    """
+    Runs the full video pipeline: keyframes, captions, transcript, summary and slides.
+
+    The visual branch (keyframes and captions) and the audio branch
+    (transcription) run concurrently and are joined before summarization;
+    their wall times are reported under "timings" in the result.
+
+    Every stage output is cached under the hash of the video bytes plus the
+    parameters that stage depends on, so a repeated upload skips straight to
+    the slides and changing e.g. only the summary prompt reuses the cached
+    keyframes, captions and transcript.
+
+    Args:
+        video_path (str): Path to the video file.
+        api_key (str): Groq API key for authentication.
+        whisper_model_size (str): Whisper model size used for transcription.
+        keyframe_params (dict): Keyword arguments overriding the iter_keyframes defaults.
+        dedup_distance (int): Maximum dHash distance for keyframes to be captioned once; None disables deduplication.
+        video_hash (str): SHA-256 of the video if already known; computed from the file otherwise.
+        use_cache (bool): When False, cached results are ignored and every stage is recomputed (and re-cached).
+        cache (StageCache): Cache to use instead of the default one.
+        progress (callable): Optional callback called as progress(stage, status) with status "running", "done" or "cached".
+        on_transcript_chunk (callable): Optional callback receiving partial transcript chunks as they complete (see transcribe_audio).
+        on_summary_token (callable): Optional callback receiving the summary text as it is generated; a cached summary arrives in one piece.
+        caption_workers (int): Maximum number of caption requests in flight.
+        transcribe_workers (int): Number of Whisper replicas transcribing audio chunks in parallel.
+        whisper_quantize (bool): Whether to transcribe with the int8 quantized Whisper model.
+
+    Returns:
+        dict: The generated summary, the URL of the PowerPoint presentation, the duplicate keyframe map and per-branch timings.
+    """
+    if cache is None:
+        cache = StageCache(bypass=not use_cache)
+    if video_hash is None:
+        video_hash = hash_file(video_path)
+
+    # Keyframes are held as JPEG bytes so neither the pipeline nor the cache keeps raw frames around
+    keyframe_params = _bound_params(iter_keyframes, {**(keyframe_params or {}), "storage": "jpeg", "return_hashes": True})
+    keyframes_key = stage_key(video_hash, "keyframes", **{
+        # Unset optional parameters are left out so adding one does not invalidate existing keys
+        name: value for name, value in keyframe_params.items() if name not in EXECUTION_PARAMS and value is not None
+    })
+    # The cache holds keyframe positions, not images, under a key of its own so entries from
+    # before that change are never read as positions
+    keyframe_index_key = stage_key(keyframes_key, "frame_indices")
+    captions_key = stage_key(keyframes_key, "captions", model=CAPTION_MODEL, prompt=CAPTION_PROMPT,
+                             dedup_distance=dedup_distance, **caption_cache_params())
+    # Quantized transcripts can differ slightly, so they are cached apart; full precision keys stay as they were
+    transcript_params = {"model_size": whisper_model_size, **({"quantize": "int8"} if whisper_quantize else {})}
+    transcript_key = stage_key(video_hash, "transcription", **transcript_params)
+
+    def visual_branch():
+        # Keyframes are only needed to caption them, so a cached caption set skips detection too
+        hit, captions = cache.get(captions_key)
+        if hit:
+            _report(progress, "keyframes", "cached")
+            _report(progress, "captions", "cached")
+            return captions
+
+        _report(progress, "keyframes", "running")
+        hit, keyframe_indices = cache.get(keyframe_index_key)
+        if hit:
+            _report(progress, "keyframes", "cached")
+            keyframes = read_keyframes(video_path, keyframe_indices, storage=keyframe_params["storage"],
+                                       jpeg_quality=keyframe_params["jpeg_quality"], spill_dir=keyframe_params["spill_dir"])
+        else:
+            keyframes = _collect_keyframes(timed_iter(iter_keyframes(video_path, **keyframe_params), "keyframes"),
+                                           cache, keyframe_index_key, progress)
+
+        # Captioning consumes keyframes as detection yields them; near-identical
+        # keyframes are captioned once and left out of the prompt
+        _report(progress, "captions", "running")
+        duplicates = {}
+        if dedup_distance is not None:
+            keyframes = iter_unique_keyframes(keyframes, max_distance=dedup_distance, duplicates=duplicates)
+        keyframes = ((frame_index, frame_image) for frame_index, frame_image, *_ in keyframes)
+        # Detection runs lazily inside captioning; its time is left out of the captions span
+        waited = {"seconds": 0.0}
+        with span("captions", exclude=waited):
+            keyframes_description = get_keyframe_descriptions(waiting_iter(keyframes, waited), api_key=api_key,
+                                                              max_workers=caption_workers)
+        print(f"Dropped {len(duplicates)} duplicate keyframes")
+        if CAPTION_ERROR not in keyframes_description.values():
+            cache.put(captions_key, (keyframes_description, duplicates))
+        _report(progress, "captions", "done")
+        return keyframes_description, duplicates
+
+    def audio_branch():
+        _report(progress, "transcription", "running")
+        hit, audio_transcript = cache.get(transcript_key)
+        if not hit:
+            whisper_model = get_whisper_model(whisper_model_size, quantize=whisper_quantize)
+            with span("transcription"):
+                audio_transcript = transcribe_audio(video_path, whisper_model, workers=transcribe_workers,
+                                                    on_chunk=on_transcript_chunk)
+            cache.put(transcript_key, audio_transcript)
+        _report(progress, "transcription", "cached" if hit else "done")
+        return audio_transcript
+
+    # The visual and audio branches only share the input file, so they run side by side
+    timings = {}
+    pipeline_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="branch") as executor:
+        visual = executor.submit(_timed, timings, "visual", visual_branch)
+        audio = executor.submit(_timed, timings, "audio", audio_branch)
+        keyframes_description, duplicates = visual.result()
+        audio_transcript = audio.result()
+
+    final_prompt = build_summary_input(keyframes_description, audio_transcript)
+
+    _report(progress, "summary", "running")
+    summary_start = time.perf_counter()
+    summary_key = stage_key(final_prompt, "summary", model=SUMMARY_MODEL, prompt=SUMMARY_PROMPT,
+                            part_prompt=PART_SUMMARY_PROMPT)
+    hit, final_summary = cache.get(summary_key)
+    if not hit:
+        with span("summary"):
+            final_summary = summarize_video(keyframes_description, audio_transcript, api_key=api_key,
+                                            on_token=on_summary_token, frame_count=video_frame_count(video_path))
+        if final_summary != SUMMARY_ERROR:
+            cache.put(summary_key, final_summary)
+    elif on_summary_token is not None:
+        on_summary_token(final_summary)
+    timings["summary"] = time.perf_counter() - summary_start
+    _report(progress, "summary", "cached" if hit else "done")
+
+    # Generate and save the PowerPoint presentation
+    _report(progress, "presentation", "running")
+    with span("presentation"):
+        ppt_filename = _timed(timings, "presentation", generate_presentation, final_summary)
+    _report(progress, "presentation", "done")
+    timings["total"] = time.perf_counter() - pipeline_start
+    print("Pipeline timings (s): " + ", ".join(f"{name}={seconds:.2f}" for name, seconds in timings.items()))
+
+    return {
+        "summary": final_summary,
+        "ppt_url": f"/presentations/{os.path.basename(ppt_filename)}" if ppt_filename else None,
+        "duplicate_keyframes": duplicates,
+        "timings": timings,
+    }
@@ -1,14 +1,27 @@
+import io
 import os
+import uuid
 from pptx import Presentation
 from pptx.util import Inches, Pt
 
+# Generated decks are written here under a unique name per job; the job queue deletes them with the job
+PRESENTATION_DIR = os.getenv("PRESENTATION_DIR", os.path.join("static", "presentations"))
+
 def fits_on_slide(text, max_chars=500):
     return len(text) <= max_chars
 
-# Function to process the summary and generate the presentation
-def generate_presentation(summary_text):
+def build_presentation(summary_text):
+    """
+    Renders a summary into a PowerPoint deck in memory.
+
+    Args:
+        summary_text (str): Summary with [Title], [Content] and optional [Conclusion] sections.
+
+    Returns:
+        bytes: The .pptx file contents, or None if the summary cannot be turned into a deck.
+    """
     # Ensure input is not empty
-    if not summary_text.strip():
+    if not summary_text or not summary_text.strip():
         print("Error: No summary text provided.")
         return
 
@@ -44,6 +57,7 @@ def generate_presentation(summary_text):
     # Add content slides
     content_slide_layout = presentation.slide_layouts[1]
     current_slide = None
+    current_heading = None
     current_text = ""
 
     for line in sections["content"]:
@@ -53,18 +67,19 @@ def generate_presentation(summary_text):
                 text_frame.text = current_text.strip()
             current_slide = presentation.slides.add_slide(content_slide_layout)
             current_slide.shapes.title.text = line
+            current_heading = line
             current_text = ""
         else:  # Bullet point
             bullet_text = line.lstrip("- ").strip()
             temp_text = current_text + "\n- " + bullet_text if current_text else "- " + bullet_text
             
             # Check if adding this bullet exceeds the slide's capacity
-            if not fits_on_slide(temp_text):
+            if current_slide and not fits_on_slide(temp_text):
                 # Save current content and start a new slide with the same heading
                 text_frame = current_slide.shapes[1].text_frame
                 text_frame.text = current_text.strip()
                 current_slide = presentation.slides.add_slide(content_slide_layout)
-                current_slide.shapes.title.text = sections["content"][sections["content"].index(line) - 1]  # Repeat heading
+                current_slide.shapes.title.text = current_heading  # Repeat heading
                 current_text = "- " + bullet_text
             else:
                 current_text = temp_text
@@ -94,12 +109,37 @@ def generate_presentation(summary_text):
         if current_text:
             text_frame.text = current_text.strip()
 
-    # Save the presentation
-    output_dir = "static/presentations"
-    os.makedirs(output_dir, exist_ok=True)
-    output_filename = os.path.join(output_dir, "generated_presentation.pptx")
+    buffer = io.BytesIO()
+    presentation.save(buffer)
+    return buffer.getvalue()
+
 
-    presentation.save(output_filename)
+# Function to process the summary and generate the presentation
+def generate_presentation(summary_text, output_filename=None):
+    """
+    Renders a summary into a PowerPoint deck and saves it under PRESENTATION_DIR.
+
+    The deck is built in memory and written to a temporary file that is then
+    renamed into place, so concurrent jobs never share or see a half-written file.
+
+    Args:
+        summary_text (str): Summary with [Title], [Content] and optional [Conclusion] sections.
+        output_filename (str): File name inside PRESENTATION_DIR; a unique name is chosen when omitted.
+
+    Returns:
+        str: Path of the saved presentation, or None if the summary cannot be turned into a deck.
+    """
+    data = build_presentation(summary_text)
+    if data is None:
+        return
+
+    # Save the presentation
+    os.makedirs(PRESENTATION_DIR, exist_ok=True)
+    output_filename = os.path.join(PRESENTATION_DIR, os.path.basename(output_filename or f"presentation_{uuid.uuid4().hex}.pptx"))
+    tmp_path = f"{output_filename}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, output_filename)
     print(f"Presentation saved as {output_filename}!")
     return output_filename
 
@@ -1,31 +1,83 @@
+import itertools
+import math
 import os
-from groq import Groq
-import cv2
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from groq import APIConnectionError, APIStatusError, Groq
 import base64
+from modules.metrics import increment, observe
+from modules.utils import JPEG_QUALITY, TokenBucket, encode_frame, frame_to_jpeg, load_frame, make_montage
 
+# Captioning concurrency defaults; CAPTION_RATE_LIMIT is in requests per second (0 disables the limit)
+CAPTION_WORKERS = int(os.getenv("CAPTION_WORKERS", "4"))
+CAPTION_RATE_LIMIT = float(os.getenv("CAPTION_RATE_LIMIT", "0"))
 
+# Upper bound in seconds on a server-sent Retry-After, so a bad header cannot stall a worker indefinitely
+MAX_RETRY_AFTER_SECONDS = float(os.getenv("MAX_RETRY_AFTER_SECONDS", "60"))
 
+# Models and prompts; the pipeline cache keys stage outputs on these, so editing one only invalidates its own stage
+SUMMARY_MODEL = "llama3-70b-8192"
+SUMMARY_PROMPT = "You will be provided the keyframe descriptions and audio transcript of a video. Generate meaningful summary in the below format\n\"\"\"\n[Title]\nMy Presentation\nA Subtitle\n\n[Content]\nIntroduction\n- Point 1 is a brief statement\n- Point 2 has some more details to explain briefly\nMain Topic\n- Detail A is a short point\n- Detail B is longer and requires more explanation to fully understand the concept\n- Detail C continues with additional information that might overflow a single slide\nAnother Section\n- Point X\n- Point Y with a longer explanation that could span multiple lines in a presentation slide\n\n[Conclusion]\nSummary of key points\n- Final thought\n\"\"\"\nimportant points to note:\nexplain the main topics as much as possible there should be content for minimum 10 pages and give output in standard format do not  make anything bold.\nthere should always be a [Title],[Content],[Conclusion] also the subheadings should not use any square brackets.\nThe output should always begin with [Title] strictly."
+CAPTION_MODEL = "llama-3.2-90b-vision-preview"
+CAPTION_PROMPT = "Summarize the key frame by identifying the main educational concepts present in the image, text,equations or diagrams in the image. Keep the summary brief but ensure it captures all essential details excluding unimportant information without excessive description."
 
-def  summarize_with_groq(final_input, api_key):
+# Token budget of the summary model. Tokens are estimated from characters (Llama 3 averages about four
+# characters per token on English text; 3.5 leaves headroom), so no tokenizer download is needed
+SUMMARY_CONTEXT_TOKENS = 8192
+SUMMARY_MAX_TOKENS = 1024
+CHARS_PER_TOKEN = 3.5
+
+# Map step of long-input summarization: concurrent partial summaries and their length cap
+SUMMARY_WORKERS = int(os.getenv("SUMMARY_WORKERS", "4"))
+PART_SUMMARY_MAX_TOKENS = 512
+PART_SUMMARY_PROMPT = "You will be provided one part of a longer video: the descriptions of its keyframes and the audio transcript of that part, or notes on consecutive parts. Write concise notes of the educational content in the order it appears, as short headings each followed by bullet points starting with \"- \". Keep every important concept, definition, equation and example, drop repetition and filler. Do not write a title, introduction or conclusion and do not make anything bold."
+
+# Caption request encoding: longest side in pixels and JPEG quality (0 keeps the stored keyframe as is), and
+# keyframes per request, sent as separate images or tiled into one numbered montage (CAPTION_BATCH_MODE)
+CAPTION_MAX_DIMENSION = int(os.getenv("CAPTION_MAX_DIMENSION", "0"))
+CAPTION_JPEG_QUALITY = int(os.getenv("CAPTION_JPEG_QUALITY", "0"))
+CAPTION_BATCH_SIZE = int(os.getenv("CAPTION_BATCH_SIZE", "1"))
+CAPTION_BATCH_MODE = os.getenv("CAPTION_BATCH_MODE", "images")
+CAPTION_BATCH_MODES = ("images", "montage")
+MONTAGE_CELL_WIDTH = 640
+CAPTION_BATCH_PROMPT = "You will be given {count} keyframes of an educational video, {layout}. For each keyframe: " + CAPTION_PROMPT + " Answer with one section per keyframe in order, each starting on its own line with \"Keyframe <number>:\" followed by its summary."
+CAPTION_BATCH_LAYOUTS = {
+    "images": "as separate images in order",
+    "montage": "tiled into one image with each keyframe's number in its top-left corner",
+}
+
+# Placeholders returned when an API call fails; results containing them are not cached
+SUMMARY_ERROR = "Summary generation failed."
+CAPTION_ERROR = "Error generating description."
+
+
+
+
+def stream_summary_with_groq(final_input, api_key):
     """
-    Summarizes the audio transcript using Groq's API.
+    Streams a summary from Groq's API as it is generated.
 
     Args:
-        audio_transcript (str): Transcribed text from the video's audio.
+        final_input (str): Keyframe descriptions and transcript, see build_summary_input.
         api_key (str): Groq API key for authentication.
 
-    Returns:
-        str: Generated summary text from Groq.
+    Yields:
+        str: Pieces of the summary text in order.
     """
     client = Groq(api_key=api_key)
+    increment("api_request_bytes_total", len(SUMMARY_PROMPT.encode()) + len(final_input.encode()), api="summary")
+    start = time.perf_counter()
 
     try:
         chat_completion = client.chat.completions.create(
-        model="llama3-70b-8192",
+        model=SUMMARY_MODEL,
         messages=[
             {
                 "role": "system",
-                "content": "You will be provided the keyframe descriptions and audio transcript of a video. Generate meaningful summary in the below format\n\"\"\"\n[Title]\nMy Presentation\nA Subtitle\n\n[Content]\nIntroduction\n- Point 1 is a brief statement\n- Point 2 has some more details to explain briefly\nMain Topic\n- Detail A is a short point\n- Detail B is longer and requires more explanation to fully understand the concept\n- Detail C continues with additional information that might overflow a single slide\nAnother Section\n- Point X\n- Point Y with a longer explanation that could span multiple lines in a presentation slide\n\n[Conclusion]\nSummary of key points\n- Final thought\n\"\"\"\nimportant points to note:\nexplain the main topics as much as possible there should be content for minimum 10 pages and give output in standard format do not  make anything bold.\nthere should always be a [Title],[Content],[Conclusion] also the subheadings should not use any square brackets.\nThe output should always begin with [Title] strictly."
+                "content": SUMMARY_PROMPT
             },
             {
                 "role": "user",
@@ -33,62 +85,107 @@ def  summarize_with_groq(final_input, api_key):
             },
         ],
         temperature=1,
-        max_tokens=1024,
+        max_tokens=SUMMARY_MAX_TOKENS,
         top_p=1,
         stream=True,
         stop=None,
     )
-        summary = ""
         for chunk in chat_completion:
-            # print(chunk.choices[0].delta.content or "", end="")
-            summary += chunk.choices[0].delta.content or ""
-        print("\n")
-        print(len(summary))
-        print(summary)
-        return summary
-    except Exception as e:
-        print(f"Error while generating summary with Groq: {e}")
-        return "Summary generation failed."
+            content = chunk.choices[0].delta.content
+            if content:
+                yield content
+        increment("api_requests_total", api="summary", outcome="ok")
+    except Exception:
+        increment("api_requests_total", api="summary", outcome="error")
+        raise
+    finally:
+        observe("api_request_seconds", time.perf_counter() - start, api="summary")
+
 
-def get_keyframe_descriptions(keyframes, api_key):
+def  summarize_with_groq(final_input, api_key, on_token=None):
     """
-    Generates detailed descriptions for each keyframe using Groq's API.
+    Summarizes the keyframe descriptions and audio transcript using Groq's API.
 
     Args:
-        keyframes (list): A list of tuples, where each tuple contains (frame_index, frame_image).
+        final_input (str): Keyframe descriptions and transcript, see build_summary_input.
         api_key (str): Groq API key for authentication.
+        on_token (callable): Optional callback receiving each piece of the summary as it arrives.
 
     Returns:
-        dict: A dictionary where keys are frame indices and values are the detailed descriptions.
+        str: Generated summary text from Groq.
     """
-    client = Groq(api_key=api_key)
-    descriptions = {}
+    pieces = []
+    try:
+        for content in stream_summary_with_groq(final_input, api_key):
+            pieces.append(content)
+            if on_token is not None:
+                on_token(content)
+    except Exception as e:
+        print(f"Error while generating summary with Groq: {e}")
+        return SUMMARY_ERROR
+    summary = "".join(pieces)
+    print("\n")
+    print(len(summary))
+    print(summary)
+    return summary
 
-    for frame_index, frame_image in keyframes:
-        # Convert the frame to a base64 URL or upload it to a hosting service to get an accessible URL
-        _, buffer = cv2.imencode(".jpg", frame_image)
-        image_bytes = base64.b64encode(buffer).decode('utf-8')
-        image_url = f"data:image/jpeg;base64,{image_bytes}"  # Example for inline image URL
+def _is_retryable(error):
+    """Returns True for rate limiting, server-side and connection errors."""
+    if isinstance(error, APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return isinstance(error, APIConnectionError)
 
+
+def _retry_delay(error, attempt, backoff):
+    """
+    Honours a Retry-After header when present, otherwise backs off exponentially with jitter.
+
+    Retry-After is capped at MAX_RETRY_AFTER_SECONDS, or at the exponential
+    backoff of this attempt if that is longer.
+    """
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        delay = float(retry_after)
+    except (TypeError, ValueError):
+        return backoff * (2 ** attempt) * (1 + random.random())
+    if math.isnan(delay):
+        delay = 0.0
+    return min(max(delay, 0.0), max(backoff * (2 ** attempt), MAX_RETRY_AFTER_SECONDS))
+
+
+def _image_part(jpeg):
+    # Convert the frame to a base64 URL or upload it to a hosting service to get an accessible URL
+    image_url = f"data:image/jpeg;base64,{base64.b64encode(jpeg).decode('utf-8')}"
+    return {"type": "image_url", "image_url": {"url": image_url}}
+
+
+def _create_caption(client, content, label, rate_limiter=None, max_retries=3, backoff=1.0):
+    """
+    Sends one caption request, retrying on 429/5xx responses.
+
+    Args:
+        client (Groq): API client.
+        content (list): Text and image parts of the user message.
+        label (str): What is being described, for log messages.
+
+    Returns:
+        str: The response text, or None if every attempt failed.
+    """
+    payload_bytes = sum(len(part["text"].encode()) if part["type"] == "text" else len(part["image_url"]["url"])
+                        for part in content)
+    for attempt in range(max_retries + 1):
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        increment("api_request_bytes_total", payload_bytes, api="caption")
+        start = time.perf_counter()
         try:
             completion = client.chat.completions.create(
-                model="llama-3.2-90b-vision-preview",
+                model=CAPTION_MODEL,
                 messages=[
                     {
                         "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                # "text": "Examine the image and provide a detailed summary, describing key objects, people, actions, and interactions. Include any visible text along with its context and significance. Highlight the overall scenario and message conveyed, ensuring the description integrates both visual and textual elements comprehensively and accurately.\n"
-                                "text": "Summarize the key frame by identifying the main educational concepts present in the image, text,equations or diagrams in the image. Keep the summary brief but ensure it captures all essential details excluding unimportant information without excessive description."
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": image_url
-                                }
-                            }
-                        ]
+                        "content": content
                     }
                 ],
                 temperature=1,
@@ -98,10 +195,433 @@ def get_keyframe_descriptions(keyframes, api_key):
                 stop=None,
             )
             description = completion.choices[0].message.content
-            descriptions[frame_index] = description
-            print(f"Generated description for frame {frame_index}")
+            print(f"Generated description for {label}")
+            increment("api_requests_total", api="caption", outcome="ok")
+            return description
         except Exception as e:
-            print(f"Error generating description for frame {frame_index}: {e}")
-            descriptions[frame_index] = "Error generating description."
+            if attempt < max_retries and _is_retryable(e):
+                increment("api_requests_total", api="caption", outcome="retry")
+                delay = _retry_delay(e, attempt, backoff)
+                print(f"Retrying {label} in {delay:.1f}s after error: {e}")
+                time.sleep(delay)
+                continue
+            print(f"Error generating description for {label}: {e}")
+            increment("api_requests_total", api="caption", outcome="error")
+            return None
+        finally:
+            observe("api_request_seconds", time.perf_counter() - start, api="caption")
+
+
+def _describe_keyframe(client, frame_index, frame_image, rate_limiter=None, max_retries=3, backoff=1.0,
+                       max_dimension=None, jpeg_quality=None):
+    """
+    Requests a description of a single keyframe, retrying on 429/5xx responses.
+
+    Returns:
+        str: The description, or an error placeholder if every attempt failed.
+    """
+    content = [
+        # "Examine the image and provide a detailed summary, describing key objects, people, actions, and interactions. Include any visible text along with its context and significance. Highlight the overall scenario and message conveyed, ensuring the description integrates both visual and textual elements comprehensively and accurately.\n"
+        {"type": "text", "text": CAPTION_PROMPT},
+        _image_part(encode_frame(frame_image, max_dimension, jpeg_quality)),
+    ]
+    description = _create_caption(client, content, f"frame {frame_index}", rate_limiter, max_retries, backoff)
+    return CAPTION_ERROR if description is None else description
+
+
+# Section headers as the batch prompt asks for them ("Keyframe 2:"), also when wrapped in markdown or a list
+# ("**Keyframe 2:**", "### Keyframe 2", "- Keyframe 2 - ...", "2. Keyframe 2: ..."): the number must be followed
+# by a colon, a dash or the end of the line, so a caption line merely starting "Keyframe 2 shows" is not one
+_KEYFRAME_SECTION = re.compile(
+    r"^[ \t*#>-]*(?:\d+[.)][ \t]+)?[*_]*keyframe[ \t]+(\d+)[ \t*_]*(?::|[-\u2013\u2014](?!\S)|$)[ \t*_]*",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+
+def split_batch_captions(text, count):
+    """
+    Splits the response to a batched caption request into one description per keyframe.
+
+    Args:
+        text (str): Response with sections starting "Keyframe <number>:" (or a markdown or list variant of it).
+        count (int): Number of keyframes in the request.
+
+    Returns:
+        dict: Keyframe number (from 1) -> description, for every non-empty section found.
+    """
+    # Headers with a repeated or out-of-range number stay in the body of the section they appear in
+    headers = []
+    seen = set()
+    for match in _KEYFRAME_SECTION.finditer(text):
+        number = int(match.group(1))
+        if 1 <= number <= count and number not in seen:
+            headers.append((number, match))
+            seen.add(number)
+
+    sections = {}
+    for (number, match), following in zip(headers, headers[1:] + [(None, None)]):
+        body = text[match.end():following[1].start() if following[1] else len(text)].strip()
+        if body:
+            sections[number] = body
+    return sections
+
+
+def _describe_keyframe_batch(client, batch, rate_limiter=None, max_retries=3, backoff=1.0, max_dimension=None,
+                             jpeg_quality=None, mode="images"):
+    """
+    Describes several keyframes with one request and maps the answer back to their frame indices.
+
+    Keyframes whose section is missing from the answer are described again
+    on their own; if the batched request fails outright, every keyframe of
+    the batch gets the error placeholder.
+
+    Returns:
+        dict: Frame index -> description, in batch order.
+    """
+    if len(batch) == 1:
+        frame_index, frame_image = batch[0]
+        return {frame_index: _describe_keyframe(client, frame_index, frame_image, rate_limiter, max_retries, backoff,
+                                                max_dimension, jpeg_quality)}
+
+    prompt = CAPTION_BATCH_PROMPT.format(count=len(batch), layout=CAPTION_BATCH_LAYOUTS[mode])
+    if mode == "montage":
+        montage = make_montage([load_frame(frame_image) for _, frame_image in batch],
+                               cell_width=min(max_dimension or MONTAGE_CELL_WIDTH, MONTAGE_CELL_WIDTH))
+        images = [frame_to_jpeg(montage, jpeg_quality or JPEG_QUALITY)]
+    else:
+        images = [encode_frame(frame_image, max_dimension, jpeg_quality) for _, frame_image in batch]
+    content = [{"type": "text", "text": prompt}] + [_image_part(jpeg) for jpeg in images]
+
+    label = "frames " + ", ".join(str(frame_index) for frame_index, _ in batch)
+    text = _create_caption(client, content, label, rate_limiter, max_retries, backoff)
+    if text is None:
+        return {frame_index: CAPTION_ERROR for frame_index, _ in batch}
+
+    sections = split_batch_captions(text, len(batch))
+    descriptions = {}
+    for number, (frame_index, frame_image) in enumerate(batch, 1):
+        if number in sections:
+            descriptions[frame_index] = sections[number]
+        else:
+            print(f"No description for frame {frame_index} in the batched answer, describing it on its own")
+            descriptions[frame_index] = _describe_keyframe(client, frame_index, frame_image, rate_limiter, max_retries,
+                                                           backoff, max_dimension, jpeg_quality)
+    return descriptions
+
+
+def caption_cache_params(batch_size=CAPTION_BATCH_SIZE, mode=CAPTION_BATCH_MODE, max_dimension=CAPTION_MAX_DIMENSION,
+                         jpeg_quality=CAPTION_JPEG_QUALITY):
+    """
+    Returns the caption settings that change the descriptions, for the captions cache key.
+
+    Settings left at their defaults are omitted, so captions cached before
+    these options existed keep their keys.
+    """
+    params = {}
+    if max_dimension:
+        params["max_dimension"] = max_dimension
+    if jpeg_quality:
+        params["jpeg_quality"] = jpeg_quality
+    if batch_size > 1:
+        params.update(batch_size=batch_size, batch_mode=mode, batch_prompt=CAPTION_BATCH_PROMPT)
+    return params
+
+
+def get_keyframe_descriptions(keyframes, api_key, max_workers=CAPTION_WORKERS, requests_per_second=CAPTION_RATE_LIMIT,
+                              max_retries=3, base_url=None, batch_size=CAPTION_BATCH_SIZE, batch_mode=CAPTION_BATCH_MODE,
+                              max_dimension=CAPTION_MAX_DIMENSION, jpeg_quality=CAPTION_JPEG_QUALITY):
+    """
+    Generates detailed descriptions for each keyframe using Groq's API.
+
+    Up to max_workers requests are kept in flight at once, optionally capped
+    by a token bucket, and rate-limited or failed (5xx) requests are retried
+    with exponential backoff. keyframes may be a generator such as
+    iter_keyframes(); it is consumed only as fast as requests complete, so
+    detection and captioning overlap without buffering every frame.
+
+    With batch_size > 1, consecutive keyframes share one request, either as
+    several images or tiled into one numbered montage, and the answer is
+    split back per frame (see split_batch_captions).
 
-    return descriptions
\ No newline at end of file
+    Args:
+        keyframes (iterable): Tuples (frame_index, frame_image); images may be arrays or stored frames from modules.utils.
+        api_key (str): Groq API key for authentication.
+        max_workers (int): Maximum number of requests in flight. 1 describes frames sequentially.
+        requests_per_second (float): Optional cap on the request rate.
+        max_retries (int): Number of retries for a frame after a 429/5xx or connection error.
+        base_url (str): Optional API base URL, e.g. a local stand-in server. Defaults to GROQ_BASE_URL or the Groq API.
+        batch_size (int): Keyframes per request.
+        batch_mode (str): "images" to attach each keyframe, "montage" to send one tiled image.
+        max_dimension (int): Longest side keyframes are downscaled to before upload; 0 keeps the full resolution.
+        jpeg_quality (int): JPEG quality of uploaded keyframes; 0 keeps the stored encoding.
+
+    Returns:
+        dict: A dictionary where keys are frame indices and values are the detailed descriptions, in keyframe order.
+    """
+    if batch_mode not in CAPTION_BATCH_MODES:
+        raise ValueError(f"Unknown caption batch mode '{batch_mode}', expected one of {CAPTION_BATCH_MODES}")
+    # Retries are handled here so they share the rate limiter with first attempts
+    client = Groq(api_key=api_key, base_url=base_url, max_retries=0)
+    rate_limiter = TokenBucket(requests_per_second) if requests_per_second else None
+    keyframes = iter(keyframes)
+    batches = iter(lambda: list(itertools.islice(keyframes, max(1, batch_size))), [])
+
+    def describe_batch(batch):
+        return _describe_keyframe_batch(client, batch, rate_limiter, max_retries, 1.0, max_dimension, jpeg_quality,
+                                        batch_mode)
+
+    if max_workers <= 1:
+        descriptions = {}
+        for batch in batches:
+            descriptions.update(describe_batch(batch))
+        return descriptions
+
+    # The semaphore stops the producer once max_workers batches are queued behind the ones in flight
+    slots = threading.BoundedSemaphore(max_workers * 2)
+
+    def describe(batch):
+        try:
+            return describe_batch(batch)
+        finally:
+            slots.release()
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="caption") as executor:
+        futures = []
+        for batch in batches:
+            slots.acquire()
+            futures.append(executor.submit(describe, batch))
+        descriptions = {}
+        for future in futures:
+            descriptions.update(future.result())
+        return descriptions
+
+
+def build_summary_input(keyframes_description, transcript):
+    """
+    Formats keyframe descriptions and a transcript as the user message of a summary request.
+
+    Args:
+        keyframes_description (dict): Frame index -> description, in time order.
+        transcript (str): Audio transcript.
+
+    Returns:
+        str: The summary input.
+    """
+    final_prompt = "Keyframe Descriptions:\n"
+    for i, desc in enumerate(keyframes_description.values(), 1):
+        final_prompt += f"Keyframe {i}: {desc}\n"
+    final_prompt += f"\nAudio Transcript:\n{transcript}"
+    return final_prompt
+
+
+def estimate_tokens(text):
+    """Estimates the number of model tokens in text, erring on the high side."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def summary_input_budget():
+    """Returns the number of input tokens a single summary request can take."""
+    return SUMMARY_CONTEXT_TOKENS - SUMMARY_MAX_TOKENS - estimate_tokens(SUMMARY_PROMPT) - 256
+
+
+def _pack(pieces, budget, separator="\n"):
+    """Greedily joins consecutive pieces into blocks of at most budget tokens; oversized pieces are cut by characters."""
+    limit = int(budget * CHARS_PER_TOKEN)
+    blocks, current = [], ""
+    for piece in pieces:
+        while len(piece) > limit:
+            if current:
+                blocks.append(current)
+                current = ""
+            blocks.append(piece[:limit])
+            piece = piece[limit:]
+        candidate = current + separator + piece if current else piece
+        if len(candidate) > limit:
+            blocks.append(current)
+            candidate = piece
+        current = candidate
+    if current:
+        blocks.append(current)
+    return blocks
+
+
+def _split_transcript(transcript, limit):
+    """Splits a transcript into sentences, breaking sentences longer than limit tokens at spaces."""
+    pieces = []
+    for sentence in re.split(r"(?<=[.!?])\s+", transcript.strip()):
+        if estimate_tokens(sentence) <= limit:
+            if sentence:
+                pieces.append(sentence)
+        else:
+            pieces.extend(_pack(sentence.split(), limit, separator=" "))
+    return pieces
+
+
+def split_summary_input(keyframes_description, transcript, budget, frame_count=None):
+    """
+    Splits keyframe descriptions and a transcript into time-ordered parts that each fit the token budget.
+
+    Each keyframe joins the part covering the same fraction of the video,
+    from its frame index over frame_count. Without frame_count the fraction
+    is taken relative to the last keyframe, which misplaces keyframes when
+    the video runs on past it. The transcript is cut at sentence boundaries
+    and spread over the parts in proportion to the room their keyframes leave
+    in the budget, assuming speech is spread evenly over the video; when it
+    does not fit, more parts are used.
+
+    Args:
+        keyframes_description (dict): Frame index -> description.
+        transcript (str): Audio transcript.
+        budget (int): Maximum estimated tokens per part.
+        frame_count (int): Number of frames in the video, if known.
+
+    Returns:
+        list: Summary inputs formatted like build_summary_input, in time order.
+    """
+    full_input = build_summary_input(keyframes_description, transcript)
+    if estimate_tokens(full_input) <= budget:
+        return [full_input]
+
+    # Sentences are small next to the budget so that filling a part wastes little of it
+    pieces = _split_transcript(transcript, max(1, budget // 32))
+    # Each piece is counted with the space that joins it to the next, so a part's pieces never add up to more
+    costs = [estimate_tokens(piece + " ") for piece in pieces]
+    last_frame = max(frame_count or 0, max(keyframes_description, default=0) + 1)
+
+    parts = math.ceil(estimate_tokens(full_input) / budget)
+    while True:
+        keyframe_parts = [{} for _ in range(parts)]
+        for frame_index, description in keyframes_description.items():
+            keyframe_parts[min(parts - 1, int(frame_index / last_frame * parts))][frame_index] = description
+        capacities = [max(0, budget - estimate_tokens(build_summary_input(keyframes_part, "")))
+                      for keyframes_part in keyframe_parts]
+
+        # A part takes the transcript up to its proportional share, and never more than its own capacity
+        scale = min(1.0, sum(costs) / max(1, sum(capacities)))
+        transcript_parts = [[] for _ in range(parts)]
+        index, used, consumed, boundary = 0, 0, 0, scale * capacities[0]
+        for piece, cost in zip(pieces, costs):
+            while index < parts - 1 and (used + cost > capacities[index] or consumed + cost > boundary):
+                index += 1
+                used = 0
+                boundary += scale * capacities[index]
+            if used + cost > capacities[index]:
+                break
+            transcript_parts[index].append(piece)
+            used += cost
+            consumed += cost
+        else:
+            break
+        if parts >= len(pieces) + len(keyframes_description):
+            # Nothing more to spread out; the rest of the transcript goes into transcript-only parts
+            room = budget - estimate_tokens(build_summary_input({}, ""))
+            for block in _pack(pieces[sum(map(len, transcript_parts)):], room, separator=" "):
+                keyframe_parts.append({})
+                transcript_parts.append([block])
+            break
+        parts += 1
+
+    chunks = []
+    for keyframes_part, transcript_part in zip(keyframe_parts, transcript_parts):
+        chunk = build_summary_input(keyframes_part, " ".join(transcript_part))
+        if estimate_tokens(chunk) <= budget:
+            chunks.append(chunk)
+        else:
+            # Keyframes that alone overflow the budget (a dense run of them) are packed line by line
+            chunks.extend(_pack(chunk.splitlines(), budget))
+    return chunks
+
+
+def _summarize_part(client, part, index, total, max_retries=3, backoff=1.0):
+    """Writes notes for one part of a long input; returns None if every attempt failed."""
+    user_input = f"Part {index} of {total}:\n{part}"
+    for attempt in range(max_retries + 1):
+        increment("api_request_bytes_total", len(PART_SUMMARY_PROMPT.encode()) + len(user_input.encode()), api="summary_part")
+        start = time.perf_counter()
+        try:
+            completion = client.chat.completions.create(
+                model=SUMMARY_MODEL,
+                messages=[
+                    {"role": "system", "content": PART_SUMMARY_PROMPT},
+                    {"role": "user", "content": user_input},
+                ],
+                temperature=0.5,
+                max_tokens=PART_SUMMARY_MAX_TOKENS,
+                top_p=1,
+                stream=False,
+                stop=None,
+            )
+            increment("api_requests_total", api="summary_part", outcome="ok")
+            print(f"Summarized part {index} of {total}")
+            return completion.choices[0].message.content
+        except Exception as e:
+            if attempt < max_retries and _is_retryable(e):
+                increment("api_requests_total", api="summary_part", outcome="retry")
+                time.sleep(_retry_delay(e, attempt, backoff))
+                continue
+            print(f"Error summarizing part {index} of {total}: {e}")
+            increment("api_requests_total", api="summary_part", outcome="error")
+            return None
+        finally:
+            observe("api_request_seconds", time.perf_counter() - start, api="summary_part")
+
+
+def summarize_map_reduce(keyframes_description, transcript, api_key, budget=None, max_workers=SUMMARY_WORKERS,
+                         on_token=None, frame_count=None):
+    """
+    Summarizes inputs too long for one request by summarizing time-ordered parts concurrently and merging the notes.
+
+    Parts are sized to the token budget, summarized into notes in parallel,
+    and the notes are merged again the same way until they fit a single
+    request, which produces the final [Title]/[Content]/[Conclusion] summary
+    through summarize_with_groq.
+
+    Args:
+        keyframes_description (dict): Frame index -> description, in time order.
+        transcript (str): Audio transcript.
+        api_key (str): Groq API key for authentication.
+        budget (int): Input tokens per request. Defaults to summary_input_budget().
+        max_workers (int): Maximum number of part summaries in flight.
+        on_token (callable): Optional callback receiving each piece of the final summary as it arrives.
+        frame_count (int): Number of frames in the video, used to line keyframes up with the transcript parts.
+
+    Returns:
+        str: Generated summary text, or SUMMARY_ERROR if a request failed.
+    """
+    budget = budget or summary_input_budget()
+    parts = split_summary_input(keyframes_description, transcript, budget, frame_count)
+    client = Groq(api_key=api_key, max_retries=0)
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="summary") as executor:
+        while len(parts) > 1:
+            print(f"Summarizing {len(parts)} parts")
+            notes = list(executor.map(lambda args: _summarize_part(client, args[1], args[0], len(parts)),
+                                      enumerate(parts, 1)))
+            if None in notes:
+                return SUMMARY_ERROR
+            labelled = [f"Notes on part {index}:\n{note}" for index, note in enumerate(notes, 1)]
+            merged = "\n\n".join(labelled)
+            parts = [merged] if estimate_tokens(merged) <= budget else _pack(labelled, budget, "\n\n")
+
+    return summarize_with_groq(parts[0], api_key=api_key, on_token=on_token)
+
+
+def summarize_video(keyframes_description, transcript, api_key, on_token=None, frame_count=None):
+    """
+    Summarizes a video from its keyframe descriptions and transcript, switching to map-reduce when the input is too long.
+
+    Args:
+        keyframes_description (dict): Frame index -> description, in time order.
+        transcript (str): Audio transcript.
+        api_key (str): Groq API key for authentication.
+        on_token (callable): Optional callback receiving each piece of the final summary as it arrives.
+        frame_count (int): Number of frames in the video, see split_summary_input.
+
+    Returns:
+        str: Generated summary text.
+    """
+    final_prompt = build_summary_input(keyframes_description, transcript)
+    if estimate_tokens(final_prompt) <= summary_input_budget():
+        return summarize_with_groq(final_prompt, api_key=api_key, on_token=on_token)
+    print(f"Summary input of ~{estimate_tokens(final_prompt)} tokens exceeds the budget, using map-reduce")
+    return summarize_map_reduce(keyframes_description, transcript, api_key, on_token=on_token, frame_count=frame_count)
@@ -0,0 +1,215 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+
+# Partial and finalized uploads live here, one file per upload id
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", os.path.join("sample", "uploads"))
+UPLOAD_TTL_SECONDS = int(os.getenv("UPLOAD_TTL_SECONDS", str(24 * 3600)))
+# Finished uploads are deleted once their job is done unless KEEP_UPLOADS is set
+KEEP_UPLOADS = os.getenv("KEEP_UPLOADS", "0").lower() in ("1", "true", "yes")
+COPY_CHUNK_SIZE = 1024 * 1024
+
+_uploads = {}
+_uploads_lock = threading.Lock()
+
+
+class UploadError(ValueError):
+    """Raised for unknown uploads or requests that do not fit the upload's state."""
+
+
+class UnknownUpload(UploadError):
+    """Raised when an upload id does not exist or has already been finalized."""
+
+
+class UploadOffsetMismatch(UploadError):
+    """Raised when a chunk does not start where the stored data ends; offset is where the client should resume."""
+
+    def __init__(self, offset):
+        super().__init__(f"Chunk must start at offset {offset}")
+        self.offset = offset
+
+
+def _safe_extension(filename):
+    extension = os.path.splitext(filename or "")[1].lower()
+    return extension if re.fullmatch(r"\.[a-z0-9]{1,8}", extension) else ""
+
+
+def unique_upload_path(filename):
+    """Returns a fresh path in UPLOAD_DIR that keeps the extension of filename."""
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    return os.path.join(UPLOAD_DIR, f"{uuid.uuid4().hex}{_safe_extension(filename)}")
+
+
+def _meta_path(upload_id):
+    return os.path.join(UPLOAD_DIR, f"{upload_id}.json")
+
+
+def _part_path(upload_id):
+    return os.path.join(UPLOAD_DIR, f"{upload_id}.part")
+
+
+def _prune_stale_uploads():
+    """Deletes partial uploads that have not received data for UPLOAD_TTL_SECONDS."""
+    now = time.time()
+    for name in os.listdir(UPLOAD_DIR):
+        if not name.endswith(".part"):
+            continue
+        path = os.path.join(UPLOAD_DIR, name)
+        try:
+            if now - os.path.getmtime(path) > UPLOAD_TTL_SECONDS:
+                upload_id = name[:-len(".part")]
+                os.remove(path)
+                if os.path.exists(_meta_path(upload_id)):
+                    os.remove(_meta_path(upload_id))
+                with _uploads_lock:
+                    _uploads.pop(upload_id, None)
+        except OSError:
+            continue
+
+
+def _get_upload(upload_id):
+    """Returns the state of an upload, recovering it from disk after a restart."""
+    if not re.fullmatch(r"[0-9a-f]{32}", upload_id):
+        raise UnknownUpload("Unknown upload")
+    with _uploads_lock:
+        upload = _uploads.get(upload_id)
+        if upload is not None:
+            return upload
+        try:
+            with open(_meta_path(upload_id)) as f:
+                meta = json.load(f)
+            offset = os.path.getsize(_part_path(upload_id))
+        except (OSError, ValueError):
+            raise UnknownUpload("Unknown upload") from None
+        # The running hash did not survive the restart; finalize rehashes the file instead
+        upload = dict(meta, offset=offset, digest=None, lock=threading.Lock())
+        _uploads[upload_id] = upload
+        return upload
+
+
+def init_upload(filename, size=None):
+    """
+    Starts a resumable upload.
+
+    Args:
+        filename (str): Client-side file name; only its extension is kept.
+        size (int): Optional total size in bytes, checked on finalize.
+
+    Returns:
+        str: The upload id.
+    """
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    _prune_stale_uploads()
+    upload_id = uuid.uuid4().hex
+    meta = {"filename": filename, "extension": _safe_extension(filename), "size": size}
+    open(_part_path(upload_id), "wb").close()
+    with open(_meta_path(upload_id), "w") as f:
+        json.dump(meta, f)
+    with _uploads_lock:
+        _uploads[upload_id] = dict(meta, offset=0, digest=hashlib.sha256(), lock=threading.Lock())
+    return upload_id
+
+
+def append_chunk(upload_id, offset, stream):
+    """
+    Appends the bytes of stream to an upload, hashing them as they are written.
+
+    Args:
+        upload_id (str): Id returned by init_upload.
+        offset (int): Position of the chunk in the file; must equal the bytes received so far.
+        stream: File-like object the chunk is read from.
+
+    Returns:
+        int: The new number of bytes received.
+    """
+    upload = _get_upload(upload_id)
+    with upload["lock"]:
+        if offset != upload["offset"]:
+            raise UploadOffsetMismatch(upload["offset"])
+        try:
+            f = open(_part_path(upload_id), "r+b")
+        except FileNotFoundError:
+            # A concurrent finalize moved the part file away while this request waited for the lock
+            raise UnknownUpload("Unknown upload") from None
+        with f:
+            f.seek(offset)
+            f.truncate()
+            for chunk in iter(lambda: stream.read(COPY_CHUNK_SIZE), b""):
+                # Bytes past the declared size are rejected before they are written, so the
+                # upload stays consistent and the client can resume from the returned offset
+                if upload["size"] is not None and upload["offset"] + len(chunk) > upload["size"]:
+                    raise UploadError(f"Chunk would exceed the declared size of {upload['size']} bytes; "
+                                      f"{upload['offset']} bytes received")
+                f.write(chunk)
+                if upload["digest"] is not None:
+                    upload["digest"].update(chunk)
+                upload["offset"] += len(chunk)
+        return upload["offset"]
+
+
+def upload_status(upload_id):
+    """Returns the bytes received so far and the declared size of an upload."""
+    upload = _get_upload(upload_id)
+    return {"upload_id": upload_id, "offset": upload["offset"], "size": upload["size"]}
+
+
+def finalize_upload(upload_id, sha256=None):
+    """
+    Completes an upload and moves it to its final, collision-free path.
+
+    Args:
+        upload_id (str): Id returned by init_upload.
+        sha256 (str): Optional digest from the client, verified against the received bytes.
+
+    Returns:
+        tuple: (path of the finalized video, hex SHA-256 of its contents)
+    """
+    upload = _get_upload(upload_id)
+    with upload["lock"]:
+        if not os.path.exists(_part_path(upload_id)):
+            # Another finalize of the same upload got the lock first
+            raise UnknownUpload("Unknown upload")
+        if upload["size"] is not None and upload["offset"] != upload["size"]:
+            raise UploadError(f"Upload incomplete: {upload['offset']} of {upload['size']} bytes received")
+        if upload["digest"] is not None:
+            digest = upload["digest"].hexdigest()
+        else:
+            with open(_part_path(upload_id), "rb") as f:
+                digest = hash_stream_to(f, None)
+        if sha256 and sha256.lower() != digest:
+            raise UploadError("Checksum mismatch")
+
+        path = os.path.join(UPLOAD_DIR, f"{upload_id}{upload['extension']}")
+        os.replace(_part_path(upload_id), path)
+        os.remove(_meta_path(upload_id))
+    with _uploads_lock:
+        _uploads.pop(upload_id, None)
+    return path, digest
+
+
+def hash_stream_to(stream, path):
+    """
+    Copies a stream to path while computing its SHA-256.
+
+    Args:
+        stream: File-like object to read from.
+        path (str): Destination path, or None to only hash.
+
+    Returns:
+        str: Hex SHA-256 of the copied bytes.
+    """
+    digest = hashlib.sha256()
+    out = open(path, "wb") if path else None
+    try:
+        for chunk in iter(lambda: stream.read(COPY_CHUNK_SIZE), b""):
+            digest.update(chunk)
+            if out:
+                out.write(chunk)
+    finally:
+        if out:
+            out.close()
+    return digest.hexdigest()
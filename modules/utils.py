@@ -0,0 +1,177 @@
+import os
+import threading
+import time
+import weakref
+
+import cv2
+import numpy as np
+
+# Quality used when keyframes are held as JPEG; matches cv2.imencode's default
+JPEG_QUALITY = 95
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket used to cap the rate of outgoing API calls.
+
+    Args:
+        rate (float): Tokens added per second.
+        capacity (float): Maximum burst size. Defaults to one second worth of tokens.
+    """
+
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Blocks until the requested number of tokens is available, then consumes them."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class EncodedFrame:
+    """
+    Keyframe image held as compressed JPEG bytes and decoded on access.
+
+    Args:
+        jpeg (bytes): The JPEG-encoded image.
+    """
+
+    __slots__ = ("jpeg",)
+
+    def __init__(self, jpeg):
+        self.jpeg = jpeg
+
+    @classmethod
+    def from_image(cls, image, quality=JPEG_QUALITY):
+        _, buffer = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        return cls(buffer.tobytes())
+
+    def to_jpeg(self):
+        return self.jpeg
+
+    def decode(self):
+        return cv2.imdecode(np.frombuffer(self.jpeg, np.uint8), cv2.IMREAD_COLOR)
+
+
+class SpilledFrame:
+    """
+    Keyframe image spilled to a JPEG file and decoded on access.
+
+    The file is deleted once the frame object is garbage collected.
+
+    Args:
+        path (str): Path of the JPEG file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        weakref.finalize(self, _remove_quietly, path)
+
+    @classmethod
+    def from_image(cls, image, path, quality=JPEG_QUALITY):
+        cv2.imwrite(path, image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        return cls(path)
+
+    def to_jpeg(self):
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def decode(self):
+        return cv2.imread(self.path, cv2.IMREAD_COLOR)
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def load_frame(frame):
+    """Returns a keyframe as a BGR ndarray, decoding it if it is stored compressed."""
+    if isinstance(frame, np.ndarray):
+        return frame
+    return frame.decode()
+
+
+def frame_to_jpeg(frame, quality=JPEG_QUALITY):
+    """Returns a keyframe as JPEG bytes, reusing the stored encoding when there is one."""
+    if isinstance(frame, np.ndarray):
+        _, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        return buffer.tobytes()
+    return frame.to_jpeg()
+
+
+def fit_within(image, max_dimension):
+    """Downscales an image so its longer side is at most max_dimension; smaller images are returned as is."""
+    height, width = image.shape[:2]
+    if not max_dimension or max(height, width) <= max_dimension:
+        return image
+    scale = max_dimension / max(height, width)
+    return cv2.resize(image, (max(1, round(width * scale)), max(1, round(height * scale))), interpolation=cv2.INTER_AREA)
+
+
+def encode_frame(frame, max_dimension=None, quality=None):
+    """
+    Returns a keyframe as JPEG bytes for an API request, optionally downscaled and re-encoded.
+
+    Args:
+        frame: BGR ndarray or stored frame.
+        max_dimension (int): Longest side in pixels; None keeps the full resolution.
+        quality (int): JPEG quality; None keeps JPEG_QUALITY, or the stored encoding when nothing else changes.
+
+    Returns:
+        bytes: The JPEG image.
+    """
+    if not max_dimension and not quality:
+        return frame_to_jpeg(frame)
+    return frame_to_jpeg(fit_within(load_frame(frame), max_dimension), quality or JPEG_QUALITY)
+
+
+def make_montage(images, cell_width=640, columns=None):
+    """
+    Tiles images into one grid image, numbering each tile from 1 in its top-left corner.
+
+    Args:
+        images (list): BGR ndarrays; every tile takes the aspect ratio of the first one.
+        cell_width (int): Width of each tile in pixels.
+        columns (int): Tiles per row. Defaults to a roughly square grid.
+
+    Returns:
+        ndarray: The montage as a BGR image.
+    """
+    columns = columns or int(np.ceil(np.sqrt(len(images))))
+    rows = int(np.ceil(len(images) / columns))
+    height, width = images[0].shape[:2]
+    cell_height = max(1, round(cell_width * height / width))
+    gap = 4
+    montage = np.zeros((rows * (cell_height + gap) - gap, columns * (cell_width + gap) - gap, 3), np.uint8)
+
+    font_scale = max(0.6, cell_height / 240)
+    thickness = max(1, round(font_scale * 2))
+    for number, image in enumerate(images, 1):
+        row, column = divmod(number - 1, columns)
+        y, x = row * (cell_height + gap), column * (cell_width + gap)
+        montage[y:y + cell_height, x:x + cell_width] = cv2.resize(image, (cell_width, cell_height),
+                                                                  interpolation=cv2.INTER_AREA)
+        # White number on a black box so it stays legible on any slide background
+        (text_width, text_height), baseline = cv2.getTextSize(str(number), cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness)
+        pad = max(4, text_height // 3)
+        cv2.rectangle(montage, (x, y), (x + text_width + 2 * pad, y + text_height + baseline + 2 * pad), (0, 0, 0), -1)
+        cv2.putText(montage, str(number), (x + pad, y + pad + text_height), cv2.FONT_HERSHEY_SIMPLEX, font_scale,
+                    (255, 255, 255), thickness)
+    return montage
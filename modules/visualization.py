@@ -1,13 +1,13 @@
 import os
-import cv2
 import datetime
+from modules.utils import frame_to_jpeg
 
 def save_keyframes(keyframes, video_path, base_output_folder="outputs/keyframes"):
     """
     Saves keyframes to a uniquely named directory based on the input video name.
 
     Args:
-        keyframes (list): List of tuples (frame_index, frame_image) for detected keyframes.
+        keyframes (iterable): Tuples (frame_index, frame_image) for detected keyframes, e.g. from iter_keyframes().
         video_path (str): Path to the input video file.
         base_output_folder (str): Base directory where keyframe folders will be created.
     """
@@ -23,7 +23,8 @@ def save_keyframes(keyframes, video_path, base_output_folder="outputs/keyframes"
 
     for frame_index, frame_image in keyframes:
         filename = os.path.join(unique_folder, f"keyframe_{frame_index}.jpg")
-        cv2.imwrite(filename, frame_image)
+        with open(filename, "wb") as f:
+            f.write(frame_to_jpeg(frame_image))
         print(f"Saved keyframe {frame_index} to {filename}")
 
     print(f"Keyframes saved to: {unique_folder}")
@@ -6,6 +6,10 @@
 # print("cuDNN Enabled:", torch.backends.cudnn.enabled)
 
 import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
 from flask import Flask, request, jsonify, render_template
 from PIL import Image
 import pytesseract
@@ -13,6 +17,7 @@ import re
 from transformers import BartForConditionalGeneration, BartTokenizer
 import assemblyai as aai
 from extractor import extract_information_from_text
+from modules.ocr import clean_ocr_text, ocr_pages
 
 pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
 
@@ -20,26 +25,118 @@ app = Flask(_name_)
 
 aai.settings.api_key = "ae3c31ffff904933a071a99e6477b7f3"  
 
-tokenizer = BartTokenizer.from_pretrained("./models/bart-fine-tuned-mts")
-model = BartForConditionalGeneration.from_pretrained("./models/bart-fine-tuned-mts")
-
-def clean_ocr_text(ocr_text):
-    lines = ocr_text.split("\n")
-    cleaned_lines = []
-    for line in lines:
-        line = line.strip()
-        if not line: 
-            continue
-        if re.match(r"^\d{5,}$", line): 
-            continue
-        if re.search(r"@|\.com|www", line, re.IGNORECASE):  
-            continue
-        if re.match(r"^Page\s\d+", line, re.IGNORECASE):  
-            continue
-        if len(line.split()) <= 2 and re.search(r"\d{2,4}", line):  
-            continue
-        cleaned_lines.append(line)
-    return "\n".join(cleaned_lines)
+# Opt-in int8 dynamic quantization of BART's linear layers for CPU-only hosts
+BART_QUANTIZE = os.getenv("BART_QUANTIZE", "0").lower() in ("1", "true", "yes")
+
+_bart = None
+_bart_lock = threading.Lock()
+
+def get_bart():
+    """
+    Loads the fine-tuned BART tokenizer and model on first use.
+
+    Loading lazily keeps importing this file cheap, which matters because
+    spawned worker processes (e.g. the OCR pool) re-import the main module.
+
+    Returns:
+        tuple: (tokenizer, model)
+    """
+    global _bart
+    with _bart_lock:
+        if _bart is None:
+            tokenizer = BartTokenizer.from_pretrained("./models/bart-fine-tuned-mts")
+            model = BartForConditionalGeneration.from_pretrained("./models/bart-fine-tuned-mts")
+            if BART_QUANTIZE:
+                # Imported here, like the model itself, so spawned workers do not pull in Whisper
+                from modules.models import quantize_linear_layers
+                model = quantize_linear_layers(model.eval())
+            _bart = (tokenizer, model)
+        return _bart
+
+# Summaries requested within BART_BATCH_WINDOW_MS of each other share one generate call
+BART_BATCH_WINDOW_MS = float(os.getenv("BART_BATCH_WINDOW_MS", "20"))
+BART_MAX_BATCH_SIZE = int(os.getenv("BART_MAX_BATCH_SIZE", "8"))
+
+
+class MicroBatcher:
+    """
+    Groups concurrent requests into batches processed by a single worker thread.
+
+    The first request of a batch waits at most window seconds for others to
+    join, so a lone request pays at most that much extra latency while
+    requests under load are processed max_batch_size at a time.
+    """
+
+    def __init__(self, process_batch, max_batch_size, window):
+        """
+        Args:
+            process_batch (callable): Takes a list of items and returns a list of results in the same order.
+            max_batch_size (int): Maximum number of items per batch.
+            window (float): Seconds to wait for more items after the first one arrives.
+        """
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.window = window
+        self._queue = queue.Queue()
+        threading.Thread(target=self._run, daemon=True, name="micro-batcher").start()
+
+    def submit(self, item):
+        """Queues item and blocks until its result is ready; errors of the batch are raised to every caller."""
+        future = Future()
+        self._queue.put((item, future))
+        return future.result()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            items = [item for item, _ in batch]
+            try:
+                results = self.process_batch(items)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+
+def generate_summaries(texts):
+    """
+    Summarizes several prompts with one padded BART generate call.
+
+    Args:
+        texts (list): Prompts to summarize.
+
+    Returns:
+        list: One cleaned summary per prompt, in the same order.
+    """
+    tokenizer, model = get_bart()
+    # Padding plus the attention mask keeps shorter prompts from attending to pad tokens
+    inputs = tokenizer(texts, return_tensors="pt", max_length=4096, truncation=True, padding=True)
+    outputs = model.generate(
+        inputs["input_ids"],
+        attention_mask=inputs["attention_mask"],
+        max_length=900,  # Adjust based on desired summary length
+        min_length=100,  # Ensure a minimum length for completeness
+        num_beams=4,
+        early_stopping=True,
+        length_penalty=1.0  # Neutral length penalty to avoid over-shortening
+    )
+    summaries = tokenizer.batch_decode(outputs, skip_special_tokens=True)
+    return [re.sub(r'\s+', ' ', summary).strip() for summary in summaries]
+
+
+summary_batcher = MicroBatcher(generate_summaries, BART_MAX_BATCH_SIZE, BART_BATCH_WINDOW_MS / 1000)
 
 @app.route('/ocr', methods=['POST'])
 def ocr():
@@ -58,6 +155,29 @@ def ocr():
     print("-----------------------------\n")
     return jsonify({"extracted_text": cleaned_text})
 
+@app.route('/ocr/batch', methods=['POST'])
+def ocr_batch():
+    # Pages are uploaded as repeated "images" fields, in page order
+    images = request.files.getlist('images')
+    if not images:
+        return jsonify({"error": "No images provided"}), 400
+    try:
+        max_width = int(request.form['max_width']) if request.form.get('max_width') else None
+    except ValueError:
+        return jsonify({"error": "max_width must be an integer"}), 400
+    binarize = request.form.get('binarize') in ('1', 'true')
+
+    try:
+        results = ocr_pages([image.read() for image in images], max_width=max_width, binarize=binarize)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    pages = [
+        {"filename": image.filename, "extracted_text": text, "cached": cached}
+        for image, (text, cached) in zip(images, results)
+    ]
+    return jsonify({"pages": pages, "extracted_text": "\n".join(page["extracted_text"] for page in pages)})
+
 @app.route('/summarize', methods=['POST'])
 def summarize(): 
     ocr_text = request.json.get("ocr_text", "")
@@ -101,19 +221,8 @@ def summarize():
         "Provide a concise discharge summary incorporating all relevant details."
     ).strip()
 
-    # Tokenize and generate summary with adjusted parameters
-    inputs = tokenizer(combined_text, return_tensors="pt", max_length=4096, truncation=True)
-    outputs = model.generate(
-        inputs["input_ids"],
-        max_length=900,  # Adjust based on desired summary length
-        min_length=100,  # Ensure a minimum length for completeness
-        num_beams=4,
-        early_stopping=True,
-        length_penalty=1.0  # Neutral length penalty to avoid over-shortening
-    )
-
-    summary = tokenizer.decode(outputs[0], skip_special_tokens=True)
-    summary = re.sub(r'\s+', ' ', summary).strip()
+    # Concurrent requests are batched into a single generate call
+    summary = summary_batcher.submit(combined_text)
 
     return jsonify({"summary": summary})
 
@@ -0,0 +1,66 @@
+import os
+import pickle
+from collections import OrderedDict
+
+from modules.cache import StageCache, stage_key
+
+
+def _cache(tmp_path, max_bytes=10 ** 9):
+    return StageCache(root=str(tmp_path), max_bytes=max_bytes)
+
+
+def test_put_then_get_round_trips(tmp_path):
+    cache = _cache(tmp_path)
+    key = stage_key("video", "keyframes", threshold=0.2)
+    cache.put(key, [(1, "a"), (2, "b")])
+    assert cache.get(key) == (True, [(1, "a"), (2, "b")])
+
+
+def test_bypass_misses_but_still_stores(tmp_path):
+    key = stage_key("video", "transcription")
+    StageCache(root=str(tmp_path), bypass=True).put(key, "text")
+    assert StageCache(root=str(tmp_path), bypass=True).get(key) == (False, None)
+    assert _cache(tmp_path).get(key) == (True, "text")
+
+
+def test_stage_key_depends_on_params():
+    assert stage_key("video", "summary", prompt="a") != stage_key("video", "summary", prompt="b")
+    assert stage_key("video", "summary", a=1, b=2) == stage_key("video", "summary", b=2, a=1)
+
+
+def test_corrupt_entries_are_misses(tmp_path):
+    cache = _cache(tmp_path)
+    payloads = [
+        b"",                                         # empty file
+        b"not a pickle at all",
+        pickle.dumps(list(range(100)))[:20],         # truncated
+        pickle.dumps(OrderedDict()).replace(b"collections", b"collectionz"),  # class that no longer exists
+    ]
+    for index, payload in enumerate(payloads):
+        key = stage_key("video", "corrupt", index=index)
+        path = cache._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(payload)
+        assert cache.get(key) == (False, None), payload
+
+        # A fresh put replaces the corrupt entry
+        cache.put(key, index)
+        assert cache.get(key) == (True, index)
+
+
+def test_eviction_drops_least_recently_used_first(tmp_path):
+    value = "x" * 1000
+    entry_size = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    cache = _cache(tmp_path, max_bytes=3 * entry_size)
+    keys = [stage_key("video", "stage", index=index) for index in range(4)]
+    for age, key in zip((400, 300, 200), keys[:3]):
+        cache.put(key, value)
+        os.utime(cache._path(key), (0, 1_000_000 - age))
+
+    # Reading the oldest entry makes it the most recently used one
+    assert cache.get(keys[0])[0]
+    cache.put(keys[3], value)
+
+    assert not os.path.exists(cache._path(keys[1]))
+    assert [cache.get(key)[0] for key in (keys[0], keys[2], keys[3])] == [True, True, True]
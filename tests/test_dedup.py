@@ -0,0 +1,54 @@
+import cv2
+import numpy as np
+
+from modules.data_processing import dhash, hamming_distance, iter_unique_keyframes
+
+
+def _slide(seed, height=180, width=320):
+    """A synthetic slide: random dark blocks on a light background."""
+    rng = np.random.default_rng(seed)
+    frame = np.full((height, width, 3), 235, np.uint8)
+    for _ in range(8):
+        x, y = int(rng.integers(0, width - 60)), int(rng.integers(0, height - 30))
+        cv2.rectangle(frame, (x, y), (x + int(rng.integers(20, 60)), y + int(rng.integers(10, 30))), (30, 30, 30), -1)
+    return frame
+
+
+def _gray(frame):
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+
+def test_dhash_is_stable_under_small_changes():
+    slide = _slide(1)
+    noisy = np.clip(slide.astype(np.int16) + np.random.default_rng(0).integers(-4, 5, slide.shape), 0, 255).astype(np.uint8)
+    with_cursor = slide.copy()
+    cv2.circle(with_cursor, (160, 90), 3, (0, 0, 255), -1)
+
+    assert dhash(_gray(slide)) == dhash(_gray(slide.copy()))
+    assert hamming_distance(dhash(_gray(slide)), dhash(_gray(noisy))) <= 5
+    assert hamming_distance(dhash(_gray(slide)), dhash(_gray(with_cursor))) <= 5
+    assert hamming_distance(dhash(_gray(slide)), dhash(_gray(_slide(2)))) > 5
+
+
+def test_iter_unique_keyframes_drops_near_duplicates():
+    first, second = _slide(1), _slide(2)
+    repeat = first.copy()
+    cv2.circle(repeat, (20, 20), 3, (0, 0, 255), -1)  # the same slide with the cursor moved
+    keyframes = [(10, first), (50, second), (90, repeat), (130, second.copy())]
+
+    duplicates = {}
+    kept = list(iter_unique_keyframes(keyframes, max_distance=5, duplicates=duplicates))
+
+    assert [frame_index for frame_index, _ in kept] == [10, 50]
+    assert kept[0][1] is first
+    assert duplicates == {90: 10, 130: 50}
+
+
+def test_iter_unique_keyframes_uses_precomputed_hashes():
+    frame = _slide(1)
+    # Hashes passed as a third element are trusted, so equal hashes collapse whatever the images show
+    keyframes = [(1, frame, 0b1010), (2, _slide(2), 0b1010), (3, _slide(3), 0b0101)]
+    duplicates = {}
+    kept = list(iter_unique_keyframes(keyframes, max_distance=0, duplicates=duplicates))
+    assert [frame_index for frame_index, _ in kept] == [1, 3]
+    assert duplicates == {2: 1}
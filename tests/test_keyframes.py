@@ -0,0 +1,36 @@
+import cv2
+import numpy as np
+
+from modules.data_processing import iter_keyframes
+from tests.test_dedup import _slide
+
+FPS = 25
+
+
+def _write_video(path, scenes):
+    """Writes (frame_count, frame or callable(i) -> frame) scenes one after another."""
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), FPS, (320, 180))
+    for count, frame in scenes:
+        for i in range(count):
+            writer.write(frame(i) if callable(frame) else frame)
+    writer.release()
+    return str(path)
+
+
+def test_adaptive_sampling_finds_a_cut_after_a_fade_in_the_same_interval(tmp_path):
+    a, b, c, d = _slide(1), _slide(2), _slide(3), _slide(4)
+    # Cut to b at 939; b fades into c from 951, still within min_scene_length of 939, then a hard cut to d at 1000.
+    # With 2 second samples the fade and the cut both fall between the samples at 950 and 1000.
+    path = _write_video(tmp_path / "fade_then_cut.avi", [
+        (939, a),
+        (12, b),
+        (12, lambda i: cv2.addWeighted(b, 1 - (i + 1) / 12, c, (i + 1) / 12, 0)),
+        (37, c),
+        (200, d),
+    ])
+
+    adaptive = [index for index, _ in iter_keyframes(path, min_scene_length=2, sample_interval=2)]
+    serial = [index for index, _ in iter_keyframes(path, min_scene_length=2, skip_frames=1, workers=1)]
+
+    assert 939 in adaptive and 1000 in adaptive
+    assert adaptive == serial
@@ -0,0 +1,91 @@
+import math
+import random
+import re
+
+from modules.summarization import build_summary_input, estimate_tokens, split_batch_captions, split_summary_input
+
+WORDS = ["lecture", "gradient", "the", "model", "of", "and", "descent", "tensor", "network"]
+
+
+def _transcript_of(chunk):
+    return chunk.split("Audio Transcript:\n", 1)[1]
+
+
+def _long_input(transcript_words, punctuate):
+    rng = random.Random(0)
+    words = [rng.choice(WORDS) for _ in range(transcript_words)]
+    if punctuate:
+        words = [word + "." if i % 12 == 11 else word for i, word in enumerate(words)]
+    keyframes = {i * 50: "A slide showing " + " ".join(rng.choice(WORDS) for _ in range(60)) for i in range(40)}
+    return keyframes, " ".join(words)
+
+
+def test_short_input_is_a_single_part():
+    keyframes = {0: "Title slide"}
+    assert split_summary_input(keyframes, "Hello.", 1000) == [build_summary_input(keyframes, "Hello.")]
+
+
+def test_parts_fit_the_budget_including_keyframes():
+    keyframes, transcript = _long_input(8000, punctuate=True)
+    budget = 2000
+    chunks = split_summary_input(keyframes, transcript, budget, frame_count=2000)
+
+    ideal = math.ceil(estimate_tokens(build_summary_input(keyframes, transcript)) / budget)
+    assert all(estimate_tokens(chunk) <= budget for chunk in chunks)
+    assert len(chunks) <= ideal + 1
+    assert " ".join(_transcript_of(chunk) for chunk in chunks).split() == transcript.split()
+    # Sentences are kept whole
+    assert all(_transcript_of(chunk).endswith(".") for chunk in chunks[:-1] if _transcript_of(chunk))
+
+
+def test_unpunctuated_transcript_is_split_between_words():
+    keyframes, transcript = _long_input(8000, punctuate=False)
+    chunks = split_summary_input(keyframes, transcript, 2000, frame_count=2000)
+
+    assert all(estimate_tokens(chunk) <= 2000 for chunk in chunks)
+    assert " ".join(_transcript_of(chunk) for chunk in chunks).split() == transcript.split()
+
+
+def test_keyframes_stay_in_time_order():
+    keyframes, transcript = _long_input(8000, punctuate=True)
+    chunks = split_summary_input(keyframes, transcript, 2000, frame_count=2000)
+    seen = [line for chunk in chunks for line in chunk.splitlines() if re.match(r"Keyframe \d+:", line)]
+    assert len(seen) == len(keyframes)
+    assert [line.split(":", 1)[1].strip() for line in seen] == list(keyframes.values())
+
+
+def test_split_batch_captions_plain_headers():
+    text = "Keyframe 1: A title slide.\nKeyframe 2: A chart of results.\nIt has two axes."
+    assert split_batch_captions(text, 2) == {1: "A title slide.", 2: "A chart of results.\nIt has two axes."}
+
+
+def test_split_batch_captions_markdown_and_list_headers():
+    text = "\n".join([
+        "**Keyframe 1:** Bold header.",
+        "### Keyframe 2",
+        "Heading on its own line.",
+        "Keyframe 3 - Dash header.",
+        "4. Keyframe 4: Numbered list header.",
+        "- **Keyframe 5**: Bullet header.",
+    ])
+    assert split_batch_captions(text, 5) == {
+        1: "Bold header.",
+        2: "Heading on its own line.",
+        3: "Dash header.",
+        4: "Numbered list header.",
+        5: "Bullet header.",
+    }
+
+
+def test_split_batch_captions_keeps_mentions_in_the_body():
+    text = "Keyframe 1: A diagram.\nKeyframe 2 shows the same diagram zoomed in.\nKeyframe 2: A table."
+    assert split_batch_captions(text, 2) == {
+        1: "A diagram.\nKeyframe 2 shows the same diagram zoomed in.",
+        2: "A table.",
+    }
+
+
+def test_split_batch_captions_ignores_repeated_and_out_of_range_numbers():
+    text = "Keyframe 1: First.\nKeyframe 1: Still first.\nKeyframe 3: Not requested.\nKeyframe 2:"
+    # An empty section is left out so the keyframe gets described again on its own
+    assert split_batch_captions(text, 2) == {1: "First.\nKeyframe 1: Still first.\nKeyframe 3: Not requested."}
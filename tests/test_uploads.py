@@ -0,0 +1,58 @@
+import hashlib
+import io
+
+import pytest
+
+from modules import uploads
+
+
+@pytest.fixture(autouse=True)
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_chunks_resume_and_finalize():
+    upload_id = uploads.init_upload("lecture.MP4", size=6)
+    assert uploads.append_chunk(upload_id, 0, io.BytesIO(b"abc")) == 3
+    with pytest.raises(uploads.UploadOffsetMismatch) as mismatch:
+        uploads.append_chunk(upload_id, 0, io.BytesIO(b"abc"))
+    assert mismatch.value.offset == 3
+    assert uploads.append_chunk(upload_id, 3, io.BytesIO(b"def")) == 6
+
+    path, digest = uploads.finalize_upload(upload_id, sha256=hashlib.sha256(b"abcdef").hexdigest())
+    assert path.endswith(".mp4")
+    with open(path, "rb") as f:
+        assert f.read() == b"abcdef"
+
+
+def test_bytes_past_the_declared_size_are_rejected_without_breaking_the_upload():
+    upload_id = uploads.init_upload("a.mp4", size=3)
+    with pytest.raises(uploads.UploadError):
+        uploads.append_chunk(upload_id, 0, io.BytesIO(b"abcd"))
+    assert uploads.upload_status(upload_id)["offset"] == 0
+
+    assert uploads.append_chunk(upload_id, 0, io.BytesIO(b"abc")) == 3
+    _, digest = uploads.finalize_upload(upload_id)
+    assert digest == hashlib.sha256(b"abc").hexdigest()
+
+
+def test_append_or_finalize_after_finalize_is_unknown():
+    upload_id = uploads.init_upload("a.mp4")
+    uploads.append_chunk(upload_id, 0, io.BytesIO(b"abc"))
+    # A request that looked the upload up before finalize removed it from the registry
+    stale = uploads._get_upload(upload_id)
+    uploads.finalize_upload(upload_id)
+    uploads._uploads[upload_id] = stale
+
+    with pytest.raises(uploads.UnknownUpload):
+        uploads.append_chunk(upload_id, 3, io.BytesIO(b"d"))
+    with pytest.raises(uploads.UnknownUpload):
+        uploads.finalize_upload(upload_id)
+
+
+def test_checksum_mismatch_is_rejected():
+    upload_id = uploads.init_upload("a.mp4")
+    uploads.append_chunk(upload_id, 0, io.BytesIO(b"abc"))
+    with pytest.raises(uploads.UploadError, match="Checksum"):
+        uploads.finalize_upload(upload_id, sha256="0" * 64)